@@ -0,0 +1,325 @@
+"""
+Benchmark runner for the puzzle solutions in the misc_puzzles repo.
+
+Each puzzle registers a setup function, which builds the input for a given
+size and returns the call to time, and a list of input sizes. Every case is
+run a number of warmup times, then timed over repeated runs, and summarized
+by its median and interquartile range (IQR).
+
+Usage:
+  python3 benchmark.py run [<puzzle>]
+  python3 benchmark.py save <baseline.json> [<puzzle>]
+  python3 benchmark.py compare <baseline.json> [<threshold>] [<puzzle>]
+  python3 benchmark.py startup [<puzzle>]
+
+Compare mode reruns the cases in the baseline, and flags any case whose
+median is slower than the baseline median by more than threshold (a
+fraction, 0.1 by default). It exits with status 1 if any case is flagged.
+
+Startup mode imports each puzzle module in a fresh interpreter with
+python -X importtime, and reports the median process wall time, the
+module's cumulative import time, and its slowest imports. It exits with
+status 1 if any import time is over the module's STARTUP_BUDGETS entry,
+or if importing the module breaks a later import of asyncio or
+concurrent.futures (see check_imports).
+"""
+
+import os
+import sys
+import json
+import subprocess
+import time
+import random
+import statistics
+import typing
+from puzzle_types import Final, Optional
+
+import box_packing
+import eight_queens
+import game_of_life
+import generate_primes
+import graph_cycle
+import max_contiguous_sum
+import number_of_islands
+import pi_monte_carlo
+import staircase_steps
+
+WARMUP: Final = 1
+REPEAT: Final = 7
+THRESHOLD: Final = 0.1
+MIN_RUN_TIME: Final = 0.01
+
+BenchCall = typing.Callable[[], typing.Any]
+BenchSetup = typing.Callable[[int], BenchCall]
+
+# median and iqr of seconds per call, runs timed, and calls per run
+BenchStats = typing.Dict[str, float]
+
+# --------------------------------------------------------------------------------
+# Puzzle setups
+
+def setup_box_packing(nboxes: int) -> BenchCall:
+    random.seed(nboxes)
+    sizes = [(random.choice([24, 48]), random.choice([24, 36, 48])) for _ in range(nboxes)]
+
+    def call():
+        boxes = [box_packing.make_box(tag, h, w) for tag, (h, w) in enumerate(sizes, start=1)]
+        return box_packing.calc_dist(96, boxes)
+    return call
+
+def setup_game_of_life(ngen: int) -> BenchCall:
+    random.seed(ngen)
+    grid = game_of_life.make_grid()
+    game_of_life.init_grid(grid)
+
+    def call():
+        next_grid = grid
+        for _ in range(ngen):
+            next_grid = game_of_life.next_generation(next_grid)
+        return next_grid
+    return call
+
+def setup_generate_primes(max_int: int) -> BenchCall:
+    return lambda: sum(1 for _ in generate_primes.generate_primes(max_int))
+
+def setup_graph_cycle(nvertices: int) -> BenchCall:
+    random.seed(nvertices)
+    edges = [tuple(sorted(random.sample(range(nvertices), 2))) for _ in range(4 * nvertices)]
+    graph = graph_cycle.Graph(range(nvertices), edges)
+    return graph.has_cycle
+
+def setup_number_of_islands(size: int) -> BenchCall:
+    random.seed(size)
+    world = [[int(random.random() < 0.4) for _ in range(size)] for _ in range(size)]
+    return lambda: number_of_islands.count_islands(number_of_islands.make_graph(world))
+
+def setup_eight_queens(size: int) -> BenchCall:
+    return lambda: eight_queens.count_queens(size)
+
+def setup_max_contiguous_sum(size: int) -> BenchCall:
+    random.seed(size)
+    nums = [random.randint(-100, 100) for _ in range(size)]
+    return lambda: max_contiguous_sum.mcs_linear(nums)
+
+def setup_staircase_steps(nsteps: int) -> BenchCall:
+    return lambda: staircase_steps.StepsCache().count(nsteps)
+
+def setup_pi_monte_carlo(samples: int) -> BenchCall:
+    random.seed(samples)
+    return lambda: pi_monte_carlo.estimate_pi(samples=samples)
+
+PUZZLES: Final = {
+    "box_packing": (setup_box_packing, [4, 8, 16]),
+    "game_of_life": (setup_game_of_life, [1, 4, 16]),
+    "generate_primes": (setup_generate_primes, [1000, 10000, 100000]),
+    "graph_cycle": (setup_graph_cycle, [1000, 10000, 100000]),
+    "number_of_islands": (setup_number_of_islands, [20, 50, 100]),
+    "eight_queens": (setup_eight_queens, [6, 8, 10]),
+    "max_contiguous_sum": (setup_max_contiguous_sum, [10000, 100000, 1000000]),
+    "staircase_steps": (setup_staircase_steps, [100, 1000, 10000]),
+    "pi_monte_carlo": (setup_pi_monte_carlo, [1000, 10000, 100000]),
+}
+
+# --------------------------------------------------------------------------------
+# Runner
+
+def case_name(puzzle: str, size: int) -> str:
+    return f"{puzzle}[{size}]"
+
+def time_call(call: BenchCall, warmup: int = WARMUP, repeat: int = REPEAT) -> BenchStats:
+    """
+    Run call warmup times untimed, then repeat times timed, and return the
+    median and interquartile range of the time per call. Fast calls are
+    looped within each timed run, so a run takes at least MIN_RUN_TIME.
+    """
+
+    for _ in range(warmup):
+        call()
+
+    number: int = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        if time.perf_counter() - start >= MIN_RUN_TIME:
+            break
+        number *= 2
+
+    times: typing.List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        times.append((time.perf_counter() - start) / number)
+
+    if len(times) >= 2:
+        quartiles = statistics.quantiles(times, n=4)
+        iqr = quartiles[2] - quartiles[0]
+    else:
+        iqr = 0.0
+    return {"median": statistics.median(times), "iqr": iqr, "runs": len(times), "number": number}
+
+def run_benchmarks(which: str = "all", cases: Optional[typing.Iterable[str]] = None) -> typing.Dict[str, BenchStats]:
+    """
+    Run benchmark cases of given puzzle (or all puzzles), printing each
+    result as it completes. If cases is given, only those cases are run.
+    """
+
+    wanted = set(cases) if cases is not None else None
+    results: typing.Dict[str, BenchStats] = {}
+
+    print("Case\t\t\t\tMedian\t\tIQR")
+    for puzzle, (setup, sizes) in PUZZLES.items():
+        if which not in ("all", puzzle):
+            continue
+        for size in sizes:
+            name = case_name(puzzle, size)
+            if wanted is not None and name not in wanted:
+                continue
+            results[name] = time_call(setup(size))
+            print(f"{name:<32}{results[name]['median']:.6f}s\t{results[name]['iqr']:.6f}s")
+
+    return results
+
+def save_baseline(path: str, which: str = "all") -> None:
+    """
+    Run benchmarks, and save results as baseline JSON.
+    """
+
+    results = run_benchmarks(which)
+    with open(path, "w") as baseline_file:
+        json.dump(results, baseline_file, indent=2, sort_keys=True)
+    print(f"Saved {len(results)} cases to {path}")
+
+def compare_baseline(path: str, threshold: float = THRESHOLD, which: str = "all") -> bool:
+    """
+    Rerun the benchmark cases saved in baseline JSON, and flag cases whose
+    median is more than threshold slower than the baseline median.
+    Return True if no case is flagged.
+    """
+
+    with open(path) as baseline_file:
+        baseline: typing.Dict[str, BenchStats] = json.load(baseline_file)
+
+    results = run_benchmarks(which, baseline.keys())
+
+    print("\nCase\t\t\t\tBase\t\tNow\t\tChange")
+    passed: bool = True
+    for name, stats in results.items():
+        base = baseline[name]["median"]
+        change = stats["median"] / base - 1.0 if base > 0 else 0.0
+        slower = change > threshold
+        passed = passed and not slower
+        flag = "  SLOWER" if slower else ""
+        print(f"{name:<32}{base:.6f}s\t{stats['median']:.6f}s\t{change:+.1%}{flag}")
+
+    return passed
+
+# --------------------------------------------------------------------------------
+# Startup
+
+# Cumulative import time budget in milliseconds per puzzle module
+STARTUP_BUDGETS: Final = {
+    "box_packing": 40.0,
+    "game_of_life": 40.0,
+    "generate_primes": 40.0,
+    "graph_cycle": 40.0,
+    "number_of_islands": 40.0,
+    "eight_queens": 40.0,
+    "max_contiguous_sum": 40.0,
+    "staircase_steps": 40.0,
+    "pi_monte_carlo": 40.0,
+}
+
+def import_times(module: str) -> typing.Tuple[float, typing.List[typing.Tuple[float, str]]]:
+    """
+    Import module in a fresh interpreter with -X importtime. Return process
+    wall time in milliseconds, and (cumulative milliseconds, name) of every
+    import, slowest first.
+    """
+
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=os.path.dirname(os.path.abspath(__file__)),
+                          capture_output=True, text=True, check=True)
+    wall = (time.perf_counter() - start) * 1000.0
+
+    imports: typing.List[typing.Tuple[float, str]] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        imports.append((int(cumulative) / 1000.0, name.strip()))
+    imports.sort(reverse=True)
+    return wall, imports
+
+# Run after importing a puzzle module, to check that its lazy imports leave
+# the standard library usable
+IMPORT_CHECK: Final = ("import asyncio, concurrent.futures; "
+                       "asyncio.Future; concurrent.futures.ProcessPoolExecutor")
+
+def check_imports(module: str) -> bool:
+    """
+    Import module, then asyncio and concurrent.futures, in a fresh
+    interpreter. Return True if that succeeds.
+    """
+
+    proc = subprocess.run([sys.executable, "-c", f"import {module}; {IMPORT_CHECK}"],
+                          cwd=os.path.dirname(os.path.abspath(__file__)),
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(proc.stderr.strip().splitlines()[-1])
+    return proc.returncode == 0
+
+def run_startup(which: str = "all", repeat: int = REPEAT, top: int = 3) -> bool:
+    """
+    Measure cold start of each puzzle module against its budget, and check
+    its imports. Return True if every module is within budget and passes
+    check_imports.
+    """
+
+    passed: bool = True
+    print("Module			Wall		Import		Budget	Slowest imports")
+    for module, budget in STARTUP_BUDGETS.items():
+        if which not in ("all", module):
+            continue
+
+        walls: typing.List[float] = []
+        module_times: typing.List[float] = []
+        for _ in range(repeat):
+            wall, imports = import_times(module)
+            walls.append(wall)
+            module_times.append(next(ms for ms, name in imports if name == module))
+
+        import_ms = statistics.median(module_times)
+        over = import_ms > budget
+        broken = not check_imports(module)
+        passed = passed and not over and not broken
+        others = [(ms, name) for ms, name in imports if name != module][:top]
+        slowest = ", ".join(f"{name} {ms:.1f}" for ms, name in others)
+        flag = ("  OVER" if over else "") + ("  BROKEN" if broken else "")
+        print(f"{module:<24}{statistics.median(walls):.1f}ms\t\t{import_ms:.1f}ms\t\t{budget:.0f}ms\t{slowest}{flag}")
+
+    return passed
+
+# --------------------------------------------------------------------------------
+# Main
+
+def main():
+    mode = sys.argv[1] if len(sys.argv) >= 2 else "run"
+    if mode == "run":
+        run_benchmarks(sys.argv[2] if len(sys.argv) >= 3 else "all")
+    elif mode == "save":
+        save_baseline(sys.argv[2], sys.argv[3] if len(sys.argv) >= 4 else "all")
+    elif mode == "compare":
+        threshold = float(sys.argv[3]) if len(sys.argv) >= 4 else THRESHOLD
+        which = sys.argv[4] if len(sys.argv) >= 5 else "all"
+        sys.exit(0 if compare_baseline(sys.argv[2], threshold, which) else 1)
+    elif mode == "startup":
+        sys.exit(0 if run_startup(sys.argv[2] if len(sys.argv) >= 3 else "all") else 1)
+    else:
+        print(__doc__)
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,17 @@ calculate the linear distance, along the y-axis of the container needed to pack
 all the boxes.
 """
 
+from __future__ import annotations
+
 import sys
-import numpy as np
-from puzzle_types import Any, Optional, Tuple, Final
+import typing
+from concurrent import futures
+from puzzle_types import lazy_import, Any, Optional, Tuple, Final
+
+if typing.TYPE_CHECKING:
+    import numpy as np
+else:
+    np = lazy_import("numpy")
 
 POINT: Final = 0
 BOX: Final = 1
@@ -61,7 +69,8 @@ def prt_box(box: Box):
 # --------------------------------------------------------------------------------
 # Container
 
-Container = np.ndarray
+if typing.TYPE_CHECKING:
+    Container = np.ndarray
 
 def make_container(h: int, w: int) -> Container:
     return np.zeros((h, w), dtype=np.int16)
@@ -119,7 +128,7 @@ def calc_dist(cw: int, boxes: list, trace: bool = False) -> int:
             for box in boxes:
                 prt_box(box)
 
-        ch = box_height(boxes[0]) * len(boxes)
+        ch = sum(box_height(box) for box in boxes)
         container = make_container(ch, cw)
         for box in boxes:
             add_box(container, box)
@@ -131,6 +140,80 @@ def calc_dist(cw: int, boxes: list, trace: bool = False) -> int:
 
     return min(try_calc(True), try_calc(False))
 
+# --------------------------------------------------------------------------------
+# Fleet
+#
+# Assign boxes to the minimum number of containers of width cw and length
+# max_height. Boxes are assigned first-fit-decreasing, by area as in calc_dist,
+# where a box fits a container if calc_dist of its boxes stays within
+# max_height. Local search then tries to empty the least utilized container
+# into the others. Finally each container is packed in a process pool.
+
+# boxes, dist, and utilization of one container
+FleetContainer = typing.Dict[str, Any]
+
+def fits(cw: int, max_height: int, boxes: list) -> bool:
+    return calc_dist(cw, list(boxes)) <= max_height
+
+def box_area_sum(boxes: list) -> int:
+    return sum(box_area(box) for box in boxes)
+
+def assign_ffd(cw: int, max_height: int, boxes: list) -> list:
+    bins: list = []
+    for box in sorted(boxes, key=lambda b: box_area(b), reverse=True):
+        if box_width(box) > cw or box_height(box) > max_height:
+            raise ValueError(f"Box {box_tag(box)} does not fit in a {max_height}x{cw} container")
+        for bin_boxes in bins:
+            if box_area_sum(bin_boxes) + box_area(box) <= cw * max_height and fits(cw, max_height, bin_boxes + [box]):
+                bin_boxes.append(box)
+                break
+        else:
+            bins.append([box])
+    return bins
+
+def improve_bins(cw: int, max_height: int, bins: list) -> list:
+    # Move every box of the least utilized container into the others,
+    # largest first; keep the result only if the container empties.
+    bins = [list(bin_boxes) for bin_boxes in bins]
+    improved = True
+    while improved and len(bins) > 1:
+        improved = False
+        bins.sort(key=box_area_sum)
+        others = [list(bin_boxes) for bin_boxes in bins[1:]]
+        for box in sorted(bins[0], key=lambda b: box_area(b), reverse=True):
+            for bin_boxes in others:
+                if box_area_sum(bin_boxes) + box_area(box) <= cw * max_height and fits(cw, max_height, bin_boxes + [box]):
+                    bin_boxes.append(box)
+                    break
+            else:
+                break
+        else:
+            bins = others
+            improved = True
+    return bins
+
+def pack_container(cw: int, boxes: list) -> int:
+    return calc_dist(cw, list(boxes))
+
+def pack_fleet(cw: int, max_height: int, boxes: list, workers: int = 0) -> typing.List[FleetContainer]:
+    bins = improve_bins(cw, max_height, assign_ffd(cw, max_height, boxes))
+
+    if workers == 1 or len(bins) <= 1:
+        dists = [pack_container(cw, bin_boxes) for bin_boxes in bins]
+    else:
+        with futures.ProcessPoolExecutor(max_workers=workers or None) as pool:
+            dists = list(pool.map(pack_container, [cw] * len(bins), bins))
+
+    return [dict(boxes=bin_boxes,
+                 dist=dist,
+                 utilization=box_area_sum(bin_boxes) / float(cw * max_height))
+            for bin_boxes, dist in zip(bins, dists)]
+
+def prt_fleet(fleet: typing.List[FleetContainer]):
+    for idx, container in enumerate(fleet, start=1):
+        tags = ",".join(str(box_tag(box)) for box in container["boxes"])
+        print(f"{idx}\t{container['dist']}\t{container['utilization']:.2f}\t{tags}")
+
 # --------------------------------------------------------------------------------
 # Tests
 
@@ -447,12 +530,30 @@ def run_test(which="all", trace=False):
     else:
         test_case(which, tests[which])
 
+def run_fleet_test(workers=0):
+    # Container Width = 96, Max Length = 96, Optimal Containers = 3
+    boxes = [make_box(tag, h, w) for tag, (h, w) in enumerate([
+        (48, 48), (48, 48), (48, 48), (48, 48), (48, 48),
+        (36, 36), (36, 36), (36, 36),
+        (24, 48), (24, 48), (24, 48), (24, 48)
+    ], start=1)]
+
+    fleet = pack_fleet(96, 96, boxes, workers=workers)
+    print("Container\tDist\tUtil\tBoxes")
+    prt_fleet(fleet)
+    print(f"Containers={len(fleet)} Check=3 Success={len(fleet) == 3}")
+
 # --------------------------------------------------------------------------------
 # Main
 
 def main():
     # Usage:
     #   python3 box_packing.py [<test_name>] [trace]
+    #   python3 box_packing.py fleet
+
+    if len(sys.argv) >= 2 and sys.argv[1] == "fleet":
+        run_fleet_test()
+        return
 
     which = "all"
     trace = False
@@ -4,28 +4,51 @@ so that no two queens threaten each other; thus, a solution requires that no two
 share the same row, column, or diagonal.
   - Wikipedia
 
-This program solves the 8 queens puzzle.
+This program solves the 8 queens puzzle, and counts or enumerates
+the solutions of the general N queens puzzle.
 """
 
-from puzzle_types import Board, NextIndexFtn, Final
+from __future__ import annotations
+
+import sys
+import time
+import typing
+from concurrent import futures
+from puzzle_types import lazy_import, Board, IntArray, NextIndexFtn, Final
+
+if typing.TYPE_CHECKING:
+    import numpy as np
+else:
+    np = lazy_import("numpy")
 
 SIZE: Final = 8
 SPACE: Final = 0
 QUEEN: Final = 1
 
-def make_board() -> Board:
+def make_board(size: int = SIZE) -> Board:
+    """
+    Create a size x size empty chess board, 8x8 by default.
+    """
+
+    return [[SPACE for _ in range(size)] for _ in range(size)]
+
+def placement_board(placement: IntArray) -> Board:
     """
-    Create an 8x8 empty chess board.
+    Create a chess board from a placement, where placement[row] is the
+    column of the queen on that row.
     """
 
-    return [[SPACE for _ in range(SIZE)] for _ in range(SIZE)]
+    board: Board = make_board(len(placement))
+    for row, col in enumerate(placement):
+        board[row][col] = QUEEN
+    return board
 
 def print_board(board: Board) -> None:
     """
     Print chess board.
     """
 
-    hsep = "-" + "----" * SIZE
+    hsep = "-" + "----" * len(board)
     print(hsep)
     for row in board:
         line = "|"
@@ -78,6 +101,255 @@ def place_queens(board: Board, row: int = 0) -> bool:
 
     return False
 
+def _place_bits(size: int, cols: int, diag1: int, diag2: int, placement: IntArray):
+    """
+    Recursively generate placements, tracking occupied columns and both
+    diagonals as bitmasks relative to the next row.
+    """
+
+    full: int = (1 << size) - 1
+    if cols == full:
+        yield placement
+        return
+
+    available: int = full & ~(cols | diag1 | diag2)
+    while available:
+        bit: int = available & -available
+        available ^= bit
+        placement.append(bit.bit_length() - 1)
+        yield from _place_bits(size, cols | bit, ((diag1 | bit) << 1) & full, (diag2 | bit) >> 1, placement)
+        placement.pop()
+
+# Largest number of search states expanded at once by _count_frontier
+FRONTIER_LIMIT: Final = 1 << 20
+
+def _count_bits(size: int, cols: int, diag1: int, diag2: int) -> int:
+    """
+    Count placements, same as _place_bits without building them, by
+    expanding the search one row at a time over NumPy arrays of states.
+    """
+
+    dtype = np.uint32 if size < 32 else np.uint64
+    remaining: int = size - bin(cols).count("1")
+    return _count_frontier((1 << size) - 1,
+                           np.array([cols], dtype=dtype),
+                           np.array([diag1], dtype=dtype),
+                           np.array([diag2], dtype=dtype),
+                           remaining)
+
+def _count_frontier(full: int, cols: np.ndarray, diag1: np.ndarray, diag2: np.ndarray, remaining: int) -> int:
+    """
+    Count placements of remaining rows from every state (cols[i], diag1[i],
+    diag2[i]). Each row expands all states by every column at once, and the
+    last row is counted without expanding, as each state has at most one
+    free column left. Frontiers over FRONTIER_LIMIT states are split into
+    chunks and counted one chunk at a time, to bound memory.
+    """
+
+    if remaining == 0:
+        return len(cols)
+
+    while remaining > 1:
+        if len(cols) > FRONTIER_LIMIT:
+            return sum(_count_frontier(full,
+                                       cols[start:start + FRONTIER_LIMIT],
+                                       diag1[start:start + FRONTIER_LIMIT],
+                                       diag2[start:start + FRONTIER_LIMIT],
+                                       remaining)
+                       for start in range(0, len(cols), FRONTIER_LIMIT))
+
+        available = ~(cols | diag1 | diag2) & full
+        next_cols, next_diag1, next_diag2 = [], [], []
+        for col in range(full.bit_length()):
+            bit = cols.dtype.type(1 << col)
+            placed = (available & bit) != 0
+            if placed.any():
+                next_cols.append(cols[placed] | bit)
+                next_diag1.append(((diag1[placed] | bit) << 1) & full)
+                next_diag2.append((diag2[placed] | bit) >> 1)
+        if not next_cols:
+            return 0
+        cols, diag1, diag2 = np.concatenate(next_cols), np.concatenate(next_diag1), np.concatenate(next_diag2)
+        remaining -= 1
+
+    return int(np.count_nonzero(~(cols | diag1 | diag2) & full))
+
+# (multiplier, placement prefix, cols, diag1, diag2)
+Subproblem = typing.Tuple[int, IntArray, int, int, int]
+
+def make_subproblems(size: int, depth: int = 1) -> typing.List[Subproblem]:
+    """
+    Split the search tree into independent subproblems by placing queens on
+    the first depth rows. By mirror symmetry, solutions with the first queen
+    in the right half mirror those in the left half, so only first row columns
+    in the left half (and the middle column for odd sizes) are used, with a
+    solution multiplier of 2 (1 for the middle column).
+    """
+
+    full: int = (1 << size) - 1
+    subproblems: typing.List[Subproblem] = []
+    for col in range((size + 1) // 2):
+        bit: int = 1 << col
+        multiplier: int = 2 if 2 * col + 1 < size else 1
+        subproblems.append((multiplier, [col], bit, (bit << 1) & full, bit >> 1))
+
+    for _ in range(1, min(depth, size)):
+        next_subproblems: typing.List[Subproblem] = []
+        for multiplier, prefix, cols, diag1, diag2 in subproblems:
+            available: int = full & ~(cols | diag1 | diag2)
+            while available:
+                bit = available & -available
+                available ^= bit
+                next_subproblems.append((multiplier, prefix + [bit.bit_length() - 1], cols | bit,
+                                         ((diag1 | bit) << 1) & full, (diag2 | bit) >> 1))
+        subproblems = next_subproblems
+
+    return subproblems
+
+def count_subproblem(size: int, subproblem: Subproblem) -> int:
+    """
+    Count solutions of a subproblem, including mirrored solutions.
+    """
+
+    multiplier, _, cols, diag1, diag2 = subproblem
+    return multiplier * _count_bits(size, cols, diag1, diag2)
+
+def solve_subproblem(size: int, subproblem: Subproblem) -> typing.List[IntArray]:
+    """
+    Enumerate solutions of a subproblem, including mirrored solutions.
+    """
+
+    multiplier, prefix, cols, diag1, diag2 = subproblem
+    placements: typing.List[IntArray] = []
+    for placement in _place_bits(size, cols, diag1, diag2, list(prefix)):
+        placements.append(list(placement))
+        if multiplier == 2:
+            placements.append([size - 1 - col for col in placement])
+    return placements
+
+def count_queens(size: int = SIZE) -> int:
+    """
+    Count all solutions of the size queens puzzle. Time grows about 6x per
+    size: on one core, N=14 takes about 1s and N=16 about 50s, so N=18
+    takes about half an hour. Use count_queens_parallel for N >= 16.
+    """
+
+    return sum(count_subproblem(size, subproblem) for subproblem in make_subproblems(size))
+
+def generate_queens(size: int = SIZE) -> typing.Generator[IntArray, None, None]:
+    """
+    Generate all solutions of the size queens puzzle, as placements where
+    placement[row] is the column of the queen on that row.
+    """
+
+    for subproblem in make_subproblems(size):
+        yield from solve_subproblem(size, subproblem)
+
+def count_queens_parallel(size: int = SIZE, workers: int = 0, depth: int = 2) -> int:
+    """
+    Count all solutions of the size queens puzzle, splitting the search by
+    the queens on the first depth rows across a process pool of workers
+    processes (default cpu count). Subproblems are handed out one at a time,
+    so idle workers pick up the remaining ones. The sum does not depend on
+    the order subproblems finish in.
+    """
+
+    subproblems: typing.List[Subproblem] = make_subproblems(size, depth)
+    with futures.ProcessPoolExecutor(max_workers=workers or None) as pool:
+        return sum(pool.map(count_subproblem, [size] * len(subproblems), subproblems))
+
+def generate_queens_parallel(size: int = SIZE,
+                             workers: int = 0,
+                             depth: int = 2) -> typing.Generator[IntArray, None, None]:
+    """
+    Generate all solutions of the size queens puzzle using a process pool.
+    Solutions are streamed in subproblem order, the same order as generate_queens.
+    """
+
+    subproblems: typing.List[Subproblem] = make_subproblems(size, depth)
+    with futures.ProcessPoolExecutor(max_workers=workers or None) as pool:
+        for placements in pool.map(solve_subproblem, [size] * len(subproblems), subproblems):
+            yield from placements
+
+def solve_partial(board: Board,
+                  find_all: bool = False,
+                  forward_check: bool = True) -> typing.Tuple[typing.List[IntArray], int]:
+    """
+    Complete a board with some queens already placed. Each free row keeps a
+    bitmask domain of columns not attacked by any placed queen. Placing a queen
+    removes its column and diagonals from the domains of the other free rows.
+
+    With forward_check, the free row with the fewest remaining columns is
+    filled next, and a placement leaving any free row with an empty domain
+    is pruned. Without it, rows are filled top to bottom, as in place_queens.
+
+    Return a pair; list of placements (only the first one unless find_all),
+    and the number of nodes (queen placements tried) searched.
+    """
+
+    size: int = len(board)
+    full: int = (1 << size) - 1
+    domains: IntArray = [full] * size
+    placement: IntArray = [-1] * size
+    solutions: typing.List[IntArray] = []
+    nodes: int = 0
+
+    def attacked(row: int, col: int, other_row: int) -> int:
+        dist: int = abs(other_row - row)
+        return ((1 << col) | (1 << (col + dist)) | (1 << col >> dist)) & full
+
+    def place(row: int, col: int) -> typing.Optional[IntArray]:
+        next_domains: IntArray = list(domains)
+        for other_row in range(size):
+            if placement[other_row] < 0 and other_row != row:
+                next_domains[other_row] &= ~attacked(row, col, other_row)
+                if forward_check and next_domains[other_row] == 0:
+                    return None
+        return next_domains
+
+    for row in range(size):
+        for col in range(size):
+            if board[row][col] == QUEEN:
+                next_domains = place(row, col) if placement[row] < 0 and domains[row] >> col & 1 else None
+                if next_domains is None:
+                    return solutions, nodes
+                placement[row] = col
+                domains = next_domains
+
+    def search() -> bool:
+        nonlocal domains, nodes
+
+        free_rows: IntArray = [row for row in range(size) if placement[row] < 0]
+        if not free_rows:
+            solutions.append(list(placement))
+            return not find_all
+
+        if forward_check:
+            row: int = min(free_rows, key=lambda r: bin(domains[r]).count("1"))
+        else:
+            row = free_rows[0]
+
+        available: int = domains[row]
+        saved_domains: IntArray = domains
+        while available:
+            bit: int = available & -available
+            available ^= bit
+            nodes += 1
+            next_domains = place(row, bit.bit_length() - 1)
+            if next_domains is None:
+                continue
+            placement[row] = bit.bit_length() - 1
+            domains = next_domains
+            done: bool = search()
+            placement[row] = -1
+            domains = saved_domains
+            if done:
+                return True
+        return False
+
+    search()
+    return solutions, nodes
+
 def solve_puzzle():
     """
     Solve 8 queens puzzle, and display result.
@@ -89,5 +361,54 @@ def solve_puzzle():
     else:
         print("Failed to solve puzzle!")
 
+def test_count(max_size: int) -> None:
+    """
+    Count solutions for sizes 1 to max_size.
+    """
+
+    for size in range(1, max_size + 1):
+        start = time.perf_counter()
+        count = count_queens(size)
+        print(f"N={size} count={count} time={time.perf_counter() - start:.4f}s")
+    placement = next(generate_queens(max_size), None)
+    if placement is not None:
+        print_board(placement_board(placement))
+
+def test_partial() -> None:
+    """
+    Complete partially filled boards, comparing node counts with and without
+    forward checking.
+    """
+
+    board: Board = make_board(10)
+    board[0][2] = QUEEN
+    board[4][7] = QUEEN
+    for forward_check in (True, False):
+        first, first_nodes = solve_partial(board, forward_check=forward_check)
+        every, every_nodes = solve_partial(board, find_all=True, forward_check=forward_check)
+        print(f"ForwardCheck={forward_check}: first={first} nodes={first_nodes} all={len(every)} nodes={every_nodes}")
+
+    board = make_board()
+    board[0][0] = QUEEN
+    board[1][1] = QUEEN
+    print(f"Conflict: {solve_partial(board)} [([], 0)]")
+
+def test_parallel(size: int) -> None:
+    """
+    Count solutions serially and in parallel.
+    """
+
+    for name, count_ftn in (("Serial", count_queens), ("Parallel", count_queens_parallel)):
+        start = time.perf_counter()
+        count = count_ftn(size)
+        print(f"{name}: N={size} count={count} time={time.perf_counter() - start:.4f}s")
+
 if __name__ == "__main__":
-    solve_puzzle()
+    if len(sys.argv) > 1 and sys.argv[1] == "count":
+        test_count(int(sys.argv[2]) if len(sys.argv) > 2 else SIZE)
+    elif len(sys.argv) > 1 and sys.argv[1] == "parallel":
+        test_parallel(int(sys.argv[2]) if len(sys.argv) > 2 else SIZE)
+    elif len(sys.argv) > 1 and sys.argv[1] == "partial":
+        test_partial()
+    else:
+        solve_puzzle()
@@ -4,13 +4,29 @@ devised by the British mathematician John Horton Conway in 1970.
   - Wikipedia
 
 This program simulates game of life.
+
+Seed patterns can be read from, and grids written to, the standard Life
+RLE format. Simulations can be recorded to a history file, which stores a
+bit-packed keyframe every few generations and the flipped cells of every
+other generation, so any generation is read back without replaying from zero.
 """
 
+from __future__ import annotations
+
 import sys
 import os
 import random
+import re
+import struct
+import tempfile
 import time
-from puzzle_types import Grid, OptIntPair, Final
+import typing
+from puzzle_types import lazy_import, Grid, IntPair, OptIntPair, Optional, Final
+
+if typing.TYPE_CHECKING:
+    import numpy as np
+else:
+    np = lazy_import("numpy")
 
 SIZE: Final = 48
 ON: Final = 1
@@ -27,11 +43,22 @@ def make_grid() -> Grid:
 
     return [[OFF for _ in range(SIZE)] for _ in range(SIZE)]
 
-def init_grid(grid: Grid) -> None:
+def init_grid(grid: Grid, pattern: Optional[str] = None) -> None:
     """
-    Set initial live cells.
+    Set initial live cells. If given, pattern is Life RLE text, which is
+    placed in the center of the grid, otherwise a built in pattern is
+    chosen at random.
     """
 
+    if pattern is not None:
+        width, height, cells = parse_rle(pattern)
+        top: int = (len(grid) - height) // 2
+        left: int = (len(grid[0]) - width) // 2
+        for i, j in cells:
+            if 0 <= top + i < len(grid) and 0 <= left + j < len(grid[0]):
+                grid[top + i][left + j] = ON
+        return
+
     which: Final = random.choice([FUNNEL, DIAMOND, XCROSS])
     if which == FUNNEL:
         for i, j in [(5, 10), (5, 11), (5, 12), (5, 13), (5, 14), (5, 15), (5, 16),
@@ -70,6 +97,282 @@ def init_grid(grid: Grid) -> None:
             grid[i][j] = ON
 
 
+# --------------------------------------------------------------------------------
+# Life RLE
+
+def parse_rle(text: str) -> typing.Tuple[int, int, typing.List[IntPair]]:
+    """
+    Parse Life RLE text, e.g. a glider:
+
+      #C Glider
+      x = 3, y = 3, rule = B3/S23
+      bob$2bo$3o!
+
+    Return (width, height, live cells as (row, col) pairs). Cell states
+    other than b (dead) are treated as live.
+    """
+
+    width: int = 0
+    height: int = 0
+    body: typing.List[str] = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("x"):
+            header = dict(field.split("=") for field in line.replace(" ", "").split(","))
+            width, height = int(header["x"]), int(header["y"])
+            continue
+        body.append(line)
+
+    cells: typing.List[IntPair] = []
+    i: int = 0
+    j: int = 0
+    for count, tag in re.findall(r"(\d*)([a-zA-Z$!.])", "".join(body)):
+        run: int = int(count) if count else 1
+        if tag == "!":
+            break
+        if tag == "$":
+            i += run
+            j = 0
+        elif tag in "b.":
+            j += run
+        else:
+            cells.extend((i, j + k) for k in range(run))
+            j += run
+
+    if cells:
+        width = max(width, max(j for _, j in cells) + 1)
+        height = max(height, max(i for i, _ in cells) + 1)
+    return width, height, cells
+
+def grid_to_rle(grid: Grid, rule: str = "B3/S23", line_width: int = 70) -> str:
+    """
+    Encode grid as Life RLE text.
+    """
+
+    tokens: typing.List[str] = []
+    cursor_row: int = 0
+
+    def token(run: int, tag: str) -> str:
+        return f"{run if run > 1 else ''}{tag}"
+
+    for row_idx, row in enumerate(grid):
+        runs: typing.List[typing.Tuple[int, int]] = []
+        for cell in row:
+            state = ON if cell == ON else OFF
+            if runs and runs[-1][1] == state:
+                runs[-1] = (runs[-1][0] + 1, state)
+            else:
+                runs.append((1, state))
+        if runs and runs[-1][1] == OFF:
+            runs.pop()
+        if not runs:
+            continue
+
+        if row_idx > cursor_row:
+            tokens.append(token(row_idx - cursor_row, "$"))
+        cursor_row = row_idx
+        tokens.extend(token(run, "o" if state == ON else "b") for run, state in runs)
+    tokens.append("!")
+
+    lines: typing.List[str] = [f"x = {len(grid[0]) if grid else 0}, y = {len(grid)}, rule = {rule}"]
+    line: str = ""
+    for tok in tokens:
+        if len(line) + len(tok) > line_width:
+            lines.append(line)
+            line = ""
+        line += tok
+    lines.append(line)
+    return "\n".join(lines) + "\n"
+
+def load_rle(path: str) -> str:
+    with open(path) as rle_file:
+        return rle_file.read()
+
+def rle_rule(text: str) -> Optional[str]:
+    """
+    Return the rulestring in the Life RLE header, if any.
+    """
+
+    match = re.search(r"^\s*x\s*=.*rule\s*=\s*([^\s,]+)", text, re.MULTILINE)
+    return match.group(1) if match else None
+
+# --------------------------------------------------------------------------------
+# Rules
+
+LIFE: Final = "B3/S23"
+HIGHLIFE: Final = "B36/S23"
+
+# Bit of each cell in the packed 3x3 neighborhood index, row major
+NEIGHBORHOOD_BITS: Final = tuple((di, dj, 3 * (di + 1) + (dj + 1)) for di in (-1, 0, 1) for dj in (-1, 0, 1))
+CENTER_BIT: Final = 4
+
+def parse_rule(rule: str) -> typing.Tuple[typing.FrozenSet[int], typing.FrozenSet[int]]:
+    """
+    Parse B/S rulestring, e.g. B3/S23 or S23/B3, into (birth counts,
+    survival counts).
+    """
+
+    birth: typing.Optional[typing.FrozenSet[int]] = None
+    survive: typing.Optional[typing.FrozenSet[int]] = None
+    for part in rule.strip().upper().split("/"):
+        if not re.fullmatch(r"[BS][0-8]*", part):
+            raise ValueError(f"Invalid rulestring {rule}")
+        counts = frozenset(int(digit) for digit in part[1:])
+        if part[0] == "B":
+            birth = counts
+        else:
+            survive = counts
+    if birth is None or survive is None:
+        raise ValueError(f"Invalid rulestring {rule}")
+    return birth, survive
+
+def compile_rule(rule: str) -> np.ndarray:
+    """
+    Compile B/S rulestring into a 512 entry uint8 lookup table, mapping the
+    packed 3x3 neighborhood index (bit 3 * row + col) to the next state of
+    the center cell.
+    """
+
+    birth, survive = parse_rule(rule)
+    table = np.zeros(512, dtype=np.uint8)
+    for index in range(512):
+        center: int = (index >> CENTER_BIT) & 1
+        live_neighbors: int = bin(index).count("1") - center
+        if live_neighbors in (survive if center else birth):
+            table[index] = ON
+    return table
+
+RULE_TABLES: typing.Dict[str, np.ndarray] = {}
+
+def rule_table(rule: str) -> np.ndarray:
+    """
+    Return compiled lookup table of rulestring, compiling it on first use.
+    """
+
+    key: str = rule.strip().upper()
+    if key not in RULE_TABLES:
+        RULE_TABLES[key] = compile_rule(key)
+    return RULE_TABLES[key]
+
+def step_cells(cells: np.ndarray, table: np.ndarray) -> np.ndarray:
+    """
+    Calculate next generation of uint8 cells array with rule lookup table.
+    Cells outside the board are dead. The packed neighborhood index of
+    every cell is built from shifted views of the padded board, and the
+    next states are gathered from the table in one operation.
+    """
+
+    rows, cols = cells.shape
+    padded = np.pad(cells, 1)
+    index = np.zeros((rows, cols), dtype=np.uint16)
+    for di, dj, bit in NEIGHBORHOOD_BITS:
+        index |= padded[1 + di:1 + di + rows, 1 + dj:1 + dj + cols].astype(np.uint16) << bit
+    return table[index]
+
+def next_generation_rule(grid: Grid, rule: str = LIFE) -> Grid:
+    """
+    Calculate next generation grid under given B/S rulestring.
+    """
+
+    cells = (np.asarray(grid) == ON).astype(np.uint8)
+    return step_cells(cells, rule_table(rule)).tolist()
+
+# --------------------------------------------------------------------------------
+# History
+
+class GridHistory:
+    """
+    This class appends generations of a grid to a history file, and reads
+    any generation back through a memory map of the file.
+
+    The file starts with a header (magic, version, rows, cols, keyframe
+    interval). Each generation is a record of kind (keyframe or delta),
+    payload size, and payload. Every interval-th generation is a keyframe
+    holding the bit-packed cells, and other generations are deltas holding
+    the uint32 indices of cells that flipped since the previous generation.
+    A companion <path>.idx file holds the uint64 offset of each record.
+    """
+
+    MAGIC: Final = b"GOLH"
+    VERSION: Final = 1
+    HEADER: Final = struct.Struct("<4sIIII")
+    RECORD: Final = struct.Struct("<BI")
+    KEYFRAME: Final = 0
+    DELTA: Final = 1
+
+    def __init__(self, path: str, rows: int = SIZE, cols: int = SIZE, interval: int = 64) -> None:
+        """
+        Open history file at path, creating it with given shape and keyframe
+        interval if it does not exist.
+        """
+
+        self.path: str = path
+        self.index_path: str = path + ".idx"
+        if os.path.exists(path):
+            with open(path, "rb") as history_file:
+                magic, version, rows, cols, interval = GridHistory.HEADER.unpack(
+                    history_file.read(GridHistory.HEADER.size))
+            assert magic == GridHistory.MAGIC and version == GridHistory.VERSION
+        else:
+            with open(path, "wb") as history_file:
+                history_file.write(GridHistory.HEADER.pack(GridHistory.MAGIC, GridHistory.VERSION, rows, cols, interval))
+            open(self.index_path, "wb").close()
+
+        self.rows: int = rows
+        self.cols: int = cols
+        self.interval: int = interval
+        self.last = np.asarray(self.get(len(self) - 1), dtype=np.uint8).ravel() if len(self) > 0 else None
+
+    def __len__(self) -> int:
+        return os.path.getsize(self.index_path) // 8
+
+    def append(self, grid: Grid) -> None:
+        """
+        Append grid as the next generation.
+        """
+
+        cells = (np.asarray(grid) == ON).astype(np.uint8).ravel()
+        assert len(cells) == self.rows * self.cols
+        if len(self) % self.interval == 0:
+            kind, payload = GridHistory.KEYFRAME, np.packbits(cells).tobytes()
+        else:
+            kind, payload = GridHistory.DELTA, np.flatnonzero(cells != self.last).astype("<u4").tobytes()
+
+        with open(self.path, "ab") as history_file:
+            offset: int = history_file.tell()
+            history_file.write(GridHistory.RECORD.pack(kind, len(payload)))
+            history_file.write(payload)
+        with open(self.index_path, "ab") as index_file:
+            index_file.write(struct.pack("<Q", offset))
+        self.last = cells
+
+    def get(self, gen: int) -> Grid:
+        """
+        Read generation gen, by decoding the nearest keyframe at or before
+        it and applying the deltas in between.
+        """
+
+        assert 0 <= gen < len(self)
+        offsets = np.memmap(self.index_path, dtype="<u8", mode="r")
+        data = np.memmap(self.path, dtype=np.uint8, mode="r")
+
+        def payload(record_gen: int):
+            offset = int(offsets[record_gen])
+            _, size = GridHistory.RECORD.unpack(data[offset:offset + GridHistory.RECORD.size].tobytes())
+            start = offset + GridHistory.RECORD.size
+            return data[start:start + size]
+
+        keyframe: int = gen - gen % self.interval
+        cells = np.unpackbits(payload(keyframe), count=self.rows * self.cols)
+        for delta_gen in range(keyframe + 1, gen + 1):
+            cells[payload(delta_gen).view("<u4")] ^= 1
+        return cells.reshape(self.rows, self.cols).tolist()
+
+# --------------------------------------------------------------------------------
+# Simulation
+
 def print_grid(grid: Grid, gen_info: OptIntPair = None) -> None:
     """
     Print game of life grid.
@@ -135,21 +438,157 @@ def next_generation(grid: Grid) -> Grid:
             next_grid[i][j] = next_cell(grid, i, j)
     return next_grid
 
-def simulate_game(ngen: int, delay: float = 0.5) -> None:
+def simulate_game(ngen: int,
+                  delay: float = 0.5,
+                  pattern: Optional[str] = None,
+                  history: Optional[GridHistory] = None,
+                  rule: Optional[str] = None) -> None:
     """
-    Simulate game of life ngen generations.
+    Simulate game of life ngen generations, starting from RLE pattern
+    if given, and recording every generation to history if given.
+    If rule is given, generations are calculated with the lookup table
+    engine under that B/S rulestring.
     """
 
     grid = make_grid()
-    init_grid(grid)
+    init_grid(grid, pattern)
+    if history is not None:
+        history.append(grid)
     print_grid(grid, (0, ngen))
     time.sleep(max(delay, 2.0))
 
     for gen in range(1, ngen + 1):
-        grid = next_generation(grid)
+        grid = next_generation(grid) if rule is None else next_generation_rule(grid, rule)
+        if history is not None:
+            history.append(grid)
         print_grid(grid, (gen, ngen))
         time.sleep(delay)
 
+def replay_game(history: GridHistory, start: int = 0, delay: float = 0.5) -> None:
+    """
+    Replay recorded generations from start, without simulating them.
+    """
+
+    for gen in range(start, len(history)):
+        print_grid(history.get(gen), (gen, len(history) - 1))
+        time.sleep(delay)
+
+def test_history(ngen: int = 40, interval: int = 8) -> None:
+    """
+    Check the grid_to_rle / parse_rle round trip, and random access reads
+    of a history file after reopening it.
+    """
+
+    random.seed(ngen)
+    grid = [[int(random.random() < 0.35) for _ in range(SIZE)] for _ in range(SIZE)]
+    width, height, cells = parse_rle(grid_to_rle(grid))
+    decoded = [[OFF] * SIZE for _ in range(SIZE)]
+    for i, j in cells:
+        decoded[i][j] = ON
+    assert decoded == grid and width <= SIZE and height <= SIZE
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "life.hist")
+        history = GridHistory(path, interval=interval)
+        grids: typing.List[Grid] = []
+        for _ in range(ngen):
+            history.append(grid)
+            grids.append(grid)
+            grid = next_generation(grid)
+
+        history = GridHistory(path)
+        assert len(history) == ngen and history.interval == interval
+        for gen in random.sample(range(ngen), ngen // 2):
+            assert history.get(gen) == grids[gen], f"gen {gen}"
+    print("History tests passed")
+
+def test_rules() -> None:
+    """
+    Check the lookup table engine against next_generation on random grids,
+    and HighLife against a replicator.
+    """
+
+    for seed in range(20):
+        random.seed(seed)
+        grid = [[int(random.random() < 0.35) for _ in range(SIZE)] for _ in range(SIZE)]
+        for _ in range(5):
+            expect = next_generation(grid)
+            assert next_generation_rule(grid, LIFE) == expect, f"seed {seed}"
+            grid = expect
+
+    # The HighLife replicator copies itself under B36/S23, but dies out under B3/S23
+    replicator = "x = 5, y = 5, rule = B36/S23\n2b3o$bo2bo$o3bo$o2bo$3o!\n"
+    assert rle_rule(replicator) == HIGHLIFE
+    grids = {}
+    for rule in (LIFE, HIGHLIFE):
+        grid = make_grid()
+        init_grid(grid, replicator)
+        for _ in range(12):
+            grid = next_generation_rule(grid, rule)
+        grids[rule] = sum(map(sum, grid))
+    assert grids[LIFE] != grids[HIGHLIFE]
+
+    assert parse_rule("s23/b36") == (frozenset({3, 6}), frozenset({2, 3}))
+    for bad in ("B9/S23", "B3", "23/3"):
+        try:
+            parse_rule(bad)
+            assert False, bad
+        except ValueError:
+            pass
+    print("Rule tests passed")
+
+def bench_rules(ngen: int = 100) -> None:
+    """
+    Time ngen generations with next_generation, and with the lookup table
+    engine under Life and HighLife rules.
+    """
+
+    random.seed(ngen)
+    grid = make_grid()
+    init_grid(grid)
+
+    start = time.perf_counter()
+    next_grid = grid
+    for _ in range(ngen):
+        next_grid = next_generation(next_grid)
+    print(f"next_generation:       {time.perf_counter() - start:.4f}s")
+
+    for rule in (LIFE, HIGHLIFE):
+        cells = np.asarray(grid, dtype=np.uint8)
+        table = rule_table(rule)
+        start = time.perf_counter()
+        for _ in range(ngen):
+            cells = step_cells(cells, table)
+        print(f"step_cells {rule:<10} {time.perf_counter() - start:.4f}s")
+
 if __name__ == "__main__":
+    # Usage:
+    #   python3 game_of_life.py [<pattern.rle>] [rule <rulestring>] [record <history>]
+    #   python3 game_of_life.py replay <history> [<start_gen>]
+    #   python3 game_of_life.py test|bench
+
     random.seed(int(time.time()))
-    simulate_game(random.randint(20, 50))
+    if len(sys.argv) >= 3 and sys.argv[1] == "replay":
+        replay_game(GridHistory(sys.argv[2]), int(sys.argv[3]) if len(sys.argv) >= 4 else 0)
+    elif len(sys.argv) == 2 and sys.argv[1] == "test":
+        test_history()
+        test_rules()
+    elif len(sys.argv) == 2 and sys.argv[1] == "bench":
+        bench_rules()
+    else:
+        args = sys.argv[1:]
+        history = None
+        if len(args) >= 2 and args[-2] == "record":
+            history = GridHistory(args[-1])
+            args = args[:-2]
+        rule = None
+        if len(args) >= 2 and args[-2] == "rule":
+            rule = args[-1]
+            args = args[:-2]
+        pattern = load_rle(args[0]) if args else None
+        if rule is None and pattern is not None and rle_rule(pattern) not in (None, LIFE):
+            rule = rle_rule(pattern)
+        simulate_game(random.randint(20, 50),
+                      pattern=pattern,
+                      history=history,
+                      rule=rule)
@@ -5,7 +5,23 @@ and use its has_cycle function to check if it contains a
 cycle.
 """
 
-from puzzle_types import VertexArray, EdgeArray, GraphMap, VertexSet, BoolVerticesPair
+from __future__ import annotations
+
+import sys
+import time
+import random
+import typing
+from concurrent import futures
+from puzzle_types import lazy_import, IntMap, VertexArray, EdgeArray, GraphMap, VertexSet, BoolVerticesPair, OptVertexArray, Optional, Final
+
+if typing.TYPE_CHECKING:
+    import numpy as np
+else:
+    np = lazy_import("numpy")
+
+WHITE: Final = 0
+GRAY: Final = 1
+BLACK: Final = 2
 
 class Graph:
     """
@@ -22,14 +38,51 @@ class Graph:
         Check if graph has a cycle.
         """
 
-        remaining_vertices: VertexSet = set(self.vertices.keys())
-        while len(remaining_vertices) > 0:
-            vertex: int = remaining_vertices.pop()
-            cycle_flag, visited = self.detect_cycle(vertex)
-            remaining_vertices -= visited
-            if cycle_flag:
-                return True
-        return False
+        return self.find_cycle() is not None
+
+    def to_csr(self) -> "CSRGraph":
+        """
+        Convert graph to compressed sparse row storage.
+        """
+
+        edges: EdgeArray = [(src, dest) for src, dests in self.vertices.items() for dest in dests]
+        return CSRGraph(list(self.vertices.keys()), edges)
+
+    def strongly_connected_components(self) -> IntMap:
+        """
+        Map each vertex to its strongly connected component. Components are
+        numbered in topological order of the condensation graph.
+        """
+
+        csr: CSRGraph = self.to_csr()
+        labels = csr.strongly_connected_components()
+        return {int(v): int(label) for v, label in zip(csr.labels, labels)}
+
+    def condensation(self) -> "Graph":
+        """
+        Build the condensation graph, which has one vertex per strongly
+        connected component and is always acyclic.
+        """
+
+        csr: CSRGraph = self.to_csr().condensation()
+        return Graph(range(csr.num_vertices()), csr.edges())
+
+    def find_cycle(self) -> OptVertexArray:
+        """
+        Find a cycle in the graph using an iterative three-color depth first search.
+        Each vertex and edge is visited at most once, so complexity is O(V + E).
+        Return the cycle as a list of vertices [v0, v1, ..., vk], where each vertex
+        has an edge to the next one and vk has an edge back to v0, or None if the
+        graph is acyclic.
+        """
+
+        colors: dict = {v: WHITE for v in self.vertices}
+        for vertex in self.vertices:
+            if colors[vertex] == WHITE:
+                cycle = self._walk(vertex, colors)
+                if cycle is not None:
+                    return cycle
+        return None
 
     def detect_cycle(self, from_vertex: int) -> BoolVerticesPair:
         """
@@ -37,23 +90,394 @@ class Graph:
         Function returns a pair; has cycle flag (True/False), and set of visited vertices.
         """
 
-        visited: VertexSet = set()
-        to_visit: VertexSet = set()
+        colors: dict = {v: WHITE for v in self.vertices}
+        cycle_flag: bool = self._walk(from_vertex, colors) is not None
+        visited: VertexSet = {v for v, color in colors.items() if color != WHITE}
+        return cycle_flag, visited
+
+    def _walk(self, from_vertex: int, colors: dict) -> OptVertexArray:
+        """
+        Iterative depth first search from given vertex. Vertices on the current
+        path are GRAY, and fully explored vertices are BLACK. Reaching a GRAY
+        vertex means a back edge, i.e. a cycle, which is rebuilt from the
+        parent links and returned.
+        """
+
+        parents: dict = {from_vertex: None}
+        colors[from_vertex] = GRAY
+        stack: list = [(from_vertex, iter(self.vertices[from_vertex]))]
+
+        while stack:
+            src_vertex, dest_vertices = stack[-1]
+            for dest_vertex in dest_vertices:
+                color = colors[dest_vertex]
+                if color == WHITE:
+                    colors[dest_vertex] = GRAY
+                    parents[dest_vertex] = src_vertex
+                    stack.append((dest_vertex, iter(self.vertices[dest_vertex])))
+                    break
+                if color == GRAY:
+                    cycle: VertexArray = [src_vertex]
+                    while cycle[-1] != dest_vertex:
+                        cycle.append(parents[cycle[-1]])
+                    cycle.reverse()
+                    return cycle
+            else:
+                colors[src_vertex] = BLACK
+                stack.pop()
+
+        return None
+
+class CSRGraph:
+    """
+    This class represents a graph (V, E) stored in compressed sparse row format.
+    Vertices are mapped to indices 0..V-1; the destinations of vertex i are
+    indices[indptr[i]:indptr[i + 1]]. Arrays are int32 whenever they fit.
+    """
+
+    def __init__(self, vertices: VertexArray, edges: EdgeArray) -> None:
+        labels = np.unique(np.asarray(vertices, dtype=np.int64))
+        edge_array = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        if not np.all(np.isin(edge_array, labels)):
+            raise KeyError("Edge references unknown vertex")
+        src = np.searchsorted(labels, edge_array[:, 0])
+        dest = np.searchsorted(labels, edge_array[:, 1])
+        self._build(len(labels), src, dest)
+        self.labels = labels
+
+    @classmethod
+    def from_arrays(cls, num_vertices: int, src: np.ndarray, dest: np.ndarray) -> "CSRGraph":
+        """
+        Build graph with vertices 0..num_vertices-1 from parallel source and destination arrays.
+        """
+
+        graph = cls.__new__(cls)
+        graph._build(num_vertices, src, dest)
+        graph.labels = None
+        return graph
+
+    @classmethod
+    def from_file(cls, path: str, num_vertices: int = 0) -> "CSRGraph":
+        """
+        Build graph from an edge list file, memory-mapped rather than read into memory.
+        A .npy file must hold an (E, 2) integer array; any other file is read as raw
+        native int32 (source, destination) pairs. Vertices are 0..num_vertices-1,
+        where num_vertices defaults to the largest vertex in the file plus one.
+        """
+
+        if path.endswith(".npy"):
+            edge_array = np.load(path, mmap_mode="r")
+        else:
+            edge_array = np.memmap(path, dtype=np.int32, mode="r")
+        edge_array = edge_array.reshape(-1, 2)
+        if num_vertices <= 0:
+            num_vertices = int(edge_array.max()) + 1 if len(edge_array) > 0 else 0
+        return cls.from_arrays(num_vertices, edge_array[:, 0], edge_array[:, 1])
+
+    def _build(self, num_vertices: int, src: np.ndarray, dest: np.ndarray) -> None:
+        """
+        Build indptr and indices arrays with a stable argsort on source vertices.
+        """
+
+        index_type = np.int32 if max(num_vertices, len(src)) < np.iinfo(np.int32).max else np.int64
+        counts = np.bincount(np.asarray(src), minlength=num_vertices)
+        if len(counts) > num_vertices:
+            raise KeyError("Edge references unknown vertex")
+        self.indptr: np.ndarray = np.zeros(num_vertices + 1, dtype=index_type)
+        np.cumsum(counts, out=self.indptr[1:])
+        order = np.argsort(src, kind="stable")
+        self.indices: np.ndarray = np.asarray(dest, dtype=index_type)[order]
+        if len(self.indices) > 0 and (self.indices.min() < 0 or self.indices.max() >= num_vertices):
+            raise KeyError("Edge references unknown vertex")
+
+    def num_vertices(self) -> int:
+        return len(self.indptr) - 1
+
+    def num_edges(self) -> int:
+        return len(self.indices)
+
+    def edges(self) -> EdgeArray:
+        src = np.repeat(np.arange(self.num_vertices()), np.diff(self.indptr))
+        return list(zip(src.tolist(), self.indices.tolist()))
+
+    def has_cycle(self) -> bool:
+        """
+        Check if graph has a cycle.
+        """
+
+        return self.find_cycle() is not None
+
+    def strongly_connected_components(self) -> np.ndarray:
+        """
+        Label vertex indices with their strongly connected component using an
+        iterative version of Tarjan's algorithm, so depth is not limited by
+        the recursion limit. Components are numbered in topological order of
+        the condensation graph. Return int32 array of size V.
+        """
+
+        size: int = self.num_vertices()
+        indptr = memoryview(np.ascontiguousarray(self.indptr))
+        indices = memoryview(np.ascontiguousarray(self.indices))
+        index = memoryview(np.full(size, -1, dtype=np.int64))
+        low = memoryview(np.zeros(size, dtype=np.int64))
+        next_edge = memoryview(np.array(self.indptr[:-1], dtype=np.int64))
+        labels = np.zeros(size, dtype=np.int32)
+        label_view = memoryview(labels)
+        on_stack = bytearray(size)
+        stack: VertexArray = []
+        counter: int = 0
+        num_components: int = 0
+
+        for root in range(size):
+            if index[root] != -1:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            call_stack: VertexArray = [root]
+            while call_stack:
+                src_vertex = call_stack[-1]
+                edge = next_edge[src_vertex]
+                if edge < indptr[src_vertex + 1]:
+                    next_edge[src_vertex] = edge + 1
+                    dest_vertex = indices[edge]
+                    if index[dest_vertex] == -1:
+                        index[dest_vertex] = low[dest_vertex] = counter
+                        counter += 1
+                        stack.append(dest_vertex)
+                        on_stack[dest_vertex] = 1
+                        call_stack.append(dest_vertex)
+                    elif on_stack[dest_vertex] and index[dest_vertex] < low[src_vertex]:
+                        low[src_vertex] = index[dest_vertex]
+                    continue
+
+                call_stack.pop()
+                if call_stack and low[src_vertex] < low[call_stack[-1]]:
+                    low[call_stack[-1]] = low[src_vertex]
+                if low[src_vertex] == index[src_vertex]:
+                    while True:
+                        vertex = stack.pop()
+                        on_stack[vertex] = 0
+                        label_view[vertex] = num_components
+                        if vertex == src_vertex:
+                            break
+                    num_components += 1
+
+        # Tarjan emits components in reverse topological order
+        return (num_components - 1 - labels).astype(np.int32)
+
+    def condensation(self, labels: Optional[np.ndarray] = None) -> "CSRGraph":
+        """
+        Build the condensation graph, with one vertex per strongly connected
+        component and duplicate edges removed. Vertex i of the result is
+        component i of the given (or computed) labels.
+        """
+
+        if labels is None:
+            labels = self.strongly_connected_components()
+        num_components: int = int(labels.max()) + 1 if len(labels) > 0 else 0
+        src = np.repeat(labels, np.diff(self.indptr)).astype(np.int64)
+        dest = labels[self.indices].astype(np.int64)
+        keep = src != dest
+        pairs = np.unique(src[keep] * num_components + dest[keep])
+        return CSRGraph.from_arrays(num_components, pairs // num_components, pairs % num_components)
+
+    def find_cycle(self) -> OptVertexArray:
+        """
+        Find a cycle using an iterative three-color depth first search over the
+        CSR arrays. Return the cycle as a list of vertices, or None if acyclic.
+        """
+
+        size: int = self.num_vertices()
+        indptr = memoryview(np.ascontiguousarray(self.indptr))
+        indices = memoryview(np.ascontiguousarray(self.indices))
+        colors = bytearray(size)
+        parents = memoryview(np.full(size, -1, dtype=np.int64))
+        next_edge = memoryview(np.array(self.indptr[:-1], dtype=np.int64))
+
+        for root in range(size):
+            if colors[root] != WHITE:
+                continue
+            colors[root] = GRAY
+            stack: VertexArray = [root]
+            while stack:
+                src_vertex = stack[-1]
+                edge = next_edge[src_vertex]
+                if edge == indptr[src_vertex + 1]:
+                    colors[src_vertex] = BLACK
+                    stack.pop()
+                    continue
+                next_edge[src_vertex] = edge + 1
+                dest_vertex = indices[edge]
+                color = colors[dest_vertex]
+                if color == WHITE:
+                    colors[dest_vertex] = GRAY
+                    parents[dest_vertex] = src_vertex
+                    stack.append(dest_vertex)
+                elif color == GRAY:
+                    cycle: VertexArray = [src_vertex]
+                    while cycle[-1] != dest_vertex:
+                        cycle.append(parents[cycle[-1]])
+                    cycle.reverse()
+                    if self.labels is not None:
+                        cycle = [int(self.labels[v]) for v in cycle]
+                    return cycle
+
+        return None
+
+class IncrementalGraph:
+    """
+    This class represents a directed acyclic graph that grows one edge at a time.
+    A topological order of the vertices is maintained with the Pearce-Kelly
+    algorithm, so an edge that would close a cycle is rejected after searching
+    only the vertices whose order lies between its two endpoints.
+    """
+
+    def __init__(self, vertices: VertexArray) -> None:
+        self.out_edges: dict = {v: set() for v in vertices}
+        self.in_edges: dict = {v: set() for v in vertices}
+        self.order: dict = {v: idx for idx, v in enumerate(self.out_edges)}
+
+    def add_vertex(self, vertex: int) -> None:
+        if vertex not in self.out_edges:
+            self.order[vertex] = len(self.order)
+            self.out_edges[vertex] = set()
+            self.in_edges[vertex] = set()
+
+    def add_edge(self, src: int, dest: int) -> bool:
+        """
+        Add edge (src, dest) unless it closes a cycle.
+        Return True if edge was added, and False if it was rejected.
+        """
+
+        if src == dest:
+            return False
+        if dest in self.out_edges[src]:
+            return True
+
+        lower: int = self.order[dest]
+        upper: int = self.order[src]
+        if lower < upper:
+            forward: OptVertexArray = self._search(dest, self.out_edges, lambda v: self.order[v] <= upper, src)
+            if forward is None:
+                return False
+            backward = self._search(src, self.in_edges, lambda v: self.order[v] >= lower, None)
+            assert backward is not None
+            self._reorder(backward, forward)
+
+        self.out_edges[src].add(dest)
+        self.in_edges[dest].add(src)
+        return True
 
-        def mark_and_collect(src_vertex):
-            visited.add(src_vertex)
-            for vertex in self.vertices[src_vertex]:
-                to_visit.add(vertex)
+    def remove_edge(self, src: int, dest: int) -> None:
+        """
+        Remove edge (src, dest). Removing an edge keeps the current order valid.
+        """
 
-        mark_and_collect(from_vertex)
+        self.out_edges[src].discard(dest)
+        self.in_edges[dest].discard(src)
+
+    def has_cycle(self) -> bool:
+        """
+        Graph never contains a cycle, edges closing one are rejected by add_edge.
+        """
 
-        while len(to_visit) > 0:
-            dest_vertex: int = to_visit.pop()
-            if dest_vertex in visited:
-                return True, visited
-            mark_and_collect(dest_vertex)
+        return False
+
+    def topological_order(self) -> VertexArray:
+        return sorted(self.order, key=self.order.__getitem__)
+
+    def _search(self, from_vertex: int, edges: dict, in_region, target) -> OptVertexArray:
+        """
+        Iterative depth first search restricted to vertices in the affected region.
+        Return visited vertices, or None if target was reached.
+        """
+
+        visited: VertexSet = {from_vertex}
+        to_visit: VertexArray = [from_vertex]
+        while to_visit:
+            for vertex in edges[to_visit.pop()]:
+                if vertex == target:
+                    return None
+                if vertex not in visited and in_region(vertex):
+                    visited.add(vertex)
+                    to_visit.append(vertex)
+        return list(visited)
+
+    def _reorder(self, backward: VertexArray, forward: VertexArray) -> None:
+        """
+        Reassign the order slots held by the affected vertices so that all
+        backward vertices (ancestors of src) precede all forward vertices
+        (descendants of dest), keeping relative order within each group.
+        """
+
+        backward.sort(key=self.order.__getitem__)
+        forward.sort(key=self.order.__getitem__)
+        slots: VertexArray = sorted(self.order[v] for v in backward + forward)
+        for vertex, slot in zip(backward + forward, slots):
+            self.order[vertex] = slot
+
+def pack_edge_lists(edge_lists: list) -> tuple:
+    """
+    Concatenate many edge lists into one (E, 2) edge array, plus an offsets
+    array where graph i owns edges[offsets[i]:offsets[i + 1]].
+    """
+
+    sizes = np.array([len(edges) for edges in edge_lists], dtype=np.int64)
+    offsets = np.zeros(len(edge_lists) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    edges = np.array([edge for edges in edge_lists for edge in edges], dtype=np.int64).reshape(-1, 2)
+    return edges, offsets
+
+def _check_chunk(edges: np.ndarray, offsets: np.ndarray, witnesses: bool) -> tuple:
+    """
+    Check a chunk of packed graphs serially. Offsets are relative to edges.
+    """
 
-        return False, visited
+    flags: list = []
+    cycles: list = []
+    edge_list: EdgeArray = list(map(tuple, edges.tolist()))
+    bounds: VertexArray = offsets.tolist()
+    for begin, end in zip(bounds[:-1], bounds[1:]):
+        graph_edges: EdgeArray = edge_list[begin:end]
+        vertices: VertexSet = {v for edge in graph_edges for v in edge}
+        cycle: OptVertexArray = Graph(vertices, graph_edges).find_cycle()
+        flags.append(cycle is not None)
+        if witnesses:
+            cycles.append(cycle)
+    return flags, cycles
+
+def batch_find_cycles(edges: np.ndarray,
+                      offsets: np.ndarray,
+                      witnesses: bool = False,
+                      workers: int = 0,
+                      chunk_size: int = 512) -> tuple:
+    """
+    Check many graphs, packed as by pack_edge_lists, for cycles. Graphs are
+    split into chunks of chunk_size and checked across a process pool of
+    workers processes (default cpu count); workers=1 checks serially.
+
+    Return a pair; bool array of has cycle flags, and a list of cycles
+    (None for acyclic graphs) if witnesses is set, or None otherwise.
+    """
+
+    num_graphs: int = len(offsets) - 1
+    starts: VertexArray = list(range(0, num_graphs, chunk_size))
+    chunks: list = [(edges[offsets[i]:offsets[min(i + chunk_size, num_graphs)]],
+                     offsets[i:min(i + chunk_size, num_graphs) + 1] - offsets[i],
+                     witnesses)
+                    for i in starts]
+
+    if workers == 1 or len(chunks) <= 1:
+        results: list = [_check_chunk(*chunk) for chunk in chunks]
+    else:
+        with futures.ProcessPoolExecutor(max_workers=workers or None) as pool:
+            results = list(pool.map(_check_chunk, *zip(*chunks)))
+
+    flags = np.array([flag for chunk_flags, _ in results for flag in chunk_flags], dtype=bool)
+    cycles: Optional[list] = [c for _, chunk_cycles in results for c in chunk_cycles] if witnesses else None
+    return flags, cycles
 
 def test_cycle() -> None:
     """
@@ -61,10 +485,11 @@ def test_cycle() -> None:
     """
 
     def test_graph(name: str, graph: Graph, cycle_flag: str) -> None:
+        csr_flag: bool = graph.to_csr().has_cycle()
         if graph.has_cycle():
-            print(f"{name}: Has Cycle [{cycle_flag}]")
+            print(f"{name}: Has Cycle [{cycle_flag}] {graph.find_cycle()} csr={csr_flag}")
         else:
-            print(f"{name}: No Cycles [{cycle_flag}]")
+            print(f"{name}: No Cycles [{cycle_flag}] csr={csr_flag}")
 
     test_graph("graph1",
                Graph([1, 2, 3],
@@ -86,6 +511,107 @@ def test_cycle() -> None:
                Graph([1, 2, 3, 4, 5, 6],
                      [(1, 2), (1, 3), (2, 3), (3, 5), (4, 1), (5, 4)]),
                "C")
+    test_graph("graph6",
+               Graph([1, 2, 3, 4, 5, 6],
+                     [(1, 2), (1, 3), (2, 4), (3, 4), (4, 5), (4, 6), (5, 6)]),
+               "N")
+
+def test_incremental() -> None:
+    """
+    Test incremental graph rejects edges closing a cycle.
+    """
+
+    def test_edge(graph: IncrementalGraph, src: int, dest: int, added_flag: str) -> None:
+        added: bool = graph.add_edge(src, dest)
+        print(f"({src}, {dest}): {'Added' if added else 'Rejected'} [{added_flag}]")
+
+    graph = IncrementalGraph([1, 2, 3, 4, 5])
+    test_edge(graph, 4, 5, "A")
+    test_edge(graph, 3, 4, "A")
+    test_edge(graph, 5, 1, "A")
+    test_edge(graph, 1, 2, "A")
+    test_edge(graph, 2, 3, "R")
+    test_edge(graph, 2, 5, "R")
+    test_edge(graph, 3, 2, "A")
+    test_edge(graph, 5, 4, "R")
+    graph.remove_edge(4, 5)
+    test_edge(graph, 5, 4, "A")
+    print(f"Order: {graph.topological_order()}")
+
+def test_components() -> None:
+    """
+    Test strongly connected components and condensation.
+    """
+
+    graph = Graph([1, 2, 3, 4, 5, 6],
+                  [(1, 2), (2, 3), (3, 1), (3, 4), (4, 5), (5, 4), (5, 6)])
+    print(f"Components: {graph.strongly_connected_components()} [1,2,3 | 4,5 | 6]")
+    condensed: Graph = graph.condensation()
+    print(f"Condensation: {condensed.vertices} cycle={condensed.has_cycle()} [0->1->2 N]")
+
+def test_batch() -> None:
+    """
+    Test batch cycle checking.
+    """
+
+    edges, offsets = pack_edge_lists([[(1, 2), (1, 3), (2, 3)],
+                                      [(1, 2), (2, 3), (3, 1)],
+                                      [],
+                                      [(4, 4)]])
+    flags, cycles = batch_find_cycles(edges, offsets, witnesses=True, workers=1)
+    print(f"Batch: {flags.tolist()} {cycles} [N C N C]")
+
+def bench_batch(num_graphs: int = 20000, num_vertices: int = 12, num_edges: int = 16) -> None:
+    """
+    Measure batch cycle checking throughput in graphs per second.
+    """
+
+    random.seed(num_graphs)
+    edge_lists: list = [[(random.randrange(num_vertices), random.randrange(num_vertices))
+                         for _ in range(num_edges)]
+                        for _ in range(num_graphs)]
+    edges, offsets = pack_edge_lists(edge_lists)
+
+    for name, workers in (("Serial", 1), ("Parallel", 0)):
+        start = time.perf_counter()
+        flags, _ = batch_find_cycles(edges, offsets, workers=workers)
+        elapsed = time.perf_counter() - start
+        print(f"{name}: graphs={num_graphs} cycles={int(flags.sum())} rate={num_graphs / elapsed:.0f} graphs/s")
+
+def bench_incremental(num_vertices: int = 1000, num_edges: int = 2000) -> None:
+    """
+    Compare incremental insertion against rebuilding a Graph and calling
+    has_cycle after every insert.
+    """
+
+    random.seed(num_vertices)
+    edges: EdgeArray = [(random.randrange(num_vertices), random.randrange(num_vertices))
+                        for _ in range(num_edges)]
+
+    start = time.perf_counter()
+    graph = IncrementalGraph(range(num_vertices))
+    for src, dest in edges:
+        graph.add_edge(src, dest)
+    incr_time = time.perf_counter() - start
+    incr_added: int = sum(len(dests) for dests in graph.out_edges.values())
+
+    start = time.perf_counter()
+    accepted: EdgeArray = []
+    for edge in edges:
+        if edge[0] != edge[1] and not Graph(range(num_vertices), accepted + [edge]).has_cycle():
+            accepted.append(edge)
+    base_time = time.perf_counter() - start
+
+    print(f"V={num_vertices} E={num_edges}")
+    print(f"Incremental: added={incr_added} time={incr_time:.4f}s")
+    print(f"Rebuild:     added={len(set(accepted))} time={base_time:.4f}s")
 
 if __name__ == "__main__":
-    test_cycle()
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        bench_incremental()
+        bench_batch()
+    else:
+        test_cycle()
+        test_incremental()
+        test_components()
+        test_batch()
@@ -0,0 +1,257 @@
+"""
+Opt-in instrumentation of the hot functions of the puzzle solutions in
+the misc_puzzles repo.
+
+Calling enable() replaces each hot function in its module (or class) with a
+wrapper which records call count, cumulative time, and net retained memory
+blocks, and forwards every call to the sinks. Callers look the functions up
+at call time, so the wrappers are picked up without code changes. Calling
+disable() restores the original functions, so instrumentation costs nothing
+while disabled.
+
+Net retained blocks are the change in sys.getallocatedblocks() across a
+call: blocks allocated and still alive on return. They are not allocation
+counts. Temporaries freed before return count 0, and calls that free more
+than they allocate count negative. Use profile mode for allocation sites
+and sizes.
+
+Sinks:
+  MemorySink - keeps a histogram of call times per function (log2 buckets)
+  LogSink    - logs a summary line per function on flush
+  JSONSink   - writes the summary to a JSON file on flush
+
+Usage:
+  python3 instrumentation.py stats <module> <function> [args...]
+  python3 instrumentation.py profile <script.py> [args...]
+
+Stats mode imports the module, enables instrumentation, and calls the
+function without arguments, with sys.argv set to [<module>, args...].
+Profile mode runs the script as __main__ under profile_run.
+"""
+
+import sys
+import json
+import math
+import time
+import typing
+import logging
+import runpy
+import cProfile
+import pstats
+import tracemalloc
+import importlib
+import functools
+from puzzle_types import Any, Final, Optional
+
+# (module, qualified name) of the instrumented hot functions
+HOT_FUNCTIONS: Final = (
+    ("box_packing", "find_add_point"),
+    ("box_packing", "add_box"),
+    ("game_of_life", "next_generation"),
+    ("game_of_life", "count_neighbors"),
+    ("generate_primes", "is_multiple_of"),
+    ("graph_cycle", "Graph.detect_cycle"),
+    ("graph_cycle", "Graph._walk"),
+    ("number_of_islands", "find_connected"),
+    ("eight_queens", "can_place_queen"),
+)
+
+# name -> {"calls": int, "time": float, "net_blocks": int}
+Stats = typing.Dict[str, typing.Dict[str, float]]
+
+# --------------------------------------------------------------------------------
+# Sinks
+
+class Sink:
+    """
+    Base sink, which receives every instrumented call, and the summary
+    stats of all calls on flush.
+    """
+
+    def record(self, name: str, elapsed: float, net_blocks: int) -> None:
+        pass
+
+    def flush(self, stats: Stats) -> None:
+        pass
+
+class MemorySink(Sink):
+    """
+    Keep a histogram of call times per function, where bucket b counts
+    calls taking between 2^(b-1) and 2^b microseconds.
+    """
+
+    def __init__(self) -> None:
+        self.histograms: typing.Dict[str, typing.Dict[int, int]] = {}
+
+    def record(self, name: str, elapsed: float, net_blocks: int) -> None:
+        bucket: int = max(0, math.ceil(math.log2(max(elapsed * 1e6, 1e-3))))
+        histogram = self.histograms.setdefault(name, {})
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+
+class LogSink(Sink):
+    """
+    Log a summary line per function on flush.
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None) -> None:
+        self.logger: logging.Logger = logger or logging.getLogger("puzzles.instrumentation")
+
+    def flush(self, stats: Stats) -> None:
+        for name, stat in stats.items():
+            self.logger.info("%s calls=%d time=%.6fs net_blocks=%d", name, stat["calls"], stat["time"], stat["net_blocks"])
+
+class JSONSink(Sink):
+    """
+    Write the summary stats to a JSON file on flush.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+
+    def flush(self, stats: Stats) -> None:
+        with open(self.path, "w") as stats_file:
+            json.dump(stats, stats_file, indent=2, sort_keys=True)
+
+# --------------------------------------------------------------------------------
+# Instrumentation
+
+STATS: Stats = {}
+SINKS: typing.List[Sink] = []
+ORIGINALS: typing.Dict[typing.Tuple[str, str], Any] = {}
+
+# Blocks held by the wrapper itself across the call (the int holding the
+# block count taken before the call)
+WRAPPER_BLOCKS: Final = 1
+
+def instrument(name: str, ftn: typing.Callable) -> typing.Callable:
+    """
+    Wrap function to record call count, cumulative time, and net retained
+    memory blocks under given name.
+    """
+
+    stat = STATS.setdefault(name, {"calls": 0, "time": 0.0, "net_blocks": 0})
+
+    @functools.wraps(ftn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        blocks = sys.getallocatedblocks()
+        try:
+            return ftn(*args, **kwargs)
+        finally:
+            net_blocks = sys.getallocatedblocks() - blocks - WRAPPER_BLOCKS
+            elapsed = time.perf_counter() - start
+            stat["calls"] += 1
+            stat["time"] += elapsed
+            stat["net_blocks"] += net_blocks
+            for sink in SINKS:
+                sink.record(name, elapsed, net_blocks)
+
+    return wrapper
+
+def _resolve(module_name: str, qualname: str) -> typing.Tuple[Any, str]:
+    """
+    Return the object holding the function (module or class), and the
+    function attribute name.
+    """
+
+    owner: Any = importlib.import_module(module_name)
+    *owners, attr = qualname.split(".")
+    for owner_name in owners:
+        owner = getattr(owner, owner_name)
+    return owner, attr
+
+def enable(sinks: typing.Iterable[Sink] = ()) -> None:
+    """
+    Instrument the hot functions, sending calls to given sinks.
+    """
+
+    SINKS[:] = list(sinks)
+    for module_name, qualname in HOT_FUNCTIONS:
+        if (module_name, qualname) in ORIGINALS:
+            continue
+        owner, attr = _resolve(module_name, qualname)
+        original = getattr(owner, attr)
+        ORIGINALS[(module_name, qualname)] = original
+        setattr(owner, attr, instrument(f"{module_name}.{qualname}", original))
+
+def disable() -> None:
+    """
+    Restore the original hot functions, and flush the stats to the sinks.
+    """
+
+    for (module_name, qualname), original in ORIGINALS.items():
+        owner, attr = _resolve(module_name, qualname)
+        setattr(owner, attr, original)
+    ORIGINALS.clear()
+    flush()
+    SINKS.clear()
+
+def flush() -> None:
+    """
+    Send the summary stats of the functions called so far to the sinks.
+    """
+
+    called: Stats = {name: dict(stat) for name, stat in STATS.items() if stat["calls"] > 0}
+    for sink in SINKS:
+        sink.flush(called)
+
+def reset() -> None:
+    STATS.clear()
+
+# --------------------------------------------------------------------------------
+# Profiling
+
+def profile_run(call: typing.Callable[[], Any], path: str = "profile", top: int = 20) -> Any:
+    """
+    Run call once under cProfile and tracemalloc. The profile is dumped to
+    <path>.prof (for pstats or snakeviz), and the top allocation sites,
+    grouped by line, are written to <path>.mem.txt. Return call result.
+    """
+
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    profiler.enable()
+    try:
+        result = call()
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+    profiler.dump_stats(f"{path}.prof")
+    with open(f"{path}.mem.txt", "w") as mem_file:
+        for stat in snapshot.statistics("lineno")[:top]:
+            mem_file.write(f"{stat}\n")
+
+    pstats.Stats(profiler).sort_stats("cumulative").print_stats(top)
+    return result
+
+def run_script(script: str, args: typing.List[str]) -> None:
+    sys.argv = [script] + args
+    runpy.run_path(script, run_name="__main__")
+
+def run_function(module_name: str, ftn_name: str, args: typing.List[str]) -> None:
+    ftn = getattr(importlib.import_module(module_name), ftn_name)
+    sys.argv = [module_name] + args
+    ftn()
+
+# --------------------------------------------------------------------------------
+# Main
+
+def main():
+    if len(sys.argv) >= 3 and sys.argv[1] == "profile":
+        script = sys.argv[2]
+        profile_run(lambda: run_script(script, sys.argv[3:]), path=script.rsplit(".", 1)[0])
+    elif len(sys.argv) >= 4 and sys.argv[1] == "stats":
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+        enable([LogSink()])
+        try:
+            run_function(sys.argv[2], sys.argv[3], sys.argv[4:])
+        finally:
+            disable()
+    else:
+        print(__doc__)
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
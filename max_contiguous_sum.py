@@ -6,7 +6,28 @@ For instance, given the list [1, -2, 3, 2, -1], the maximum
 contiguous sum is 5, which is the sum of the sub range [3, 2].
 """
 
-from puzzle_types import IntArray
+from __future__ import annotations
+
+import os
+import sys
+import time
+import random
+import tempfile
+import typing
+from concurrent import futures
+from puzzle_types import lazy_import, IntArray, IntMatrix, Optional, Final
+
+if typing.TYPE_CHECKING:
+    import numpy as np
+else:
+    np = lazy_import("numpy")
+
+# (total, best_prefix, prefix_end, best_suffix, suffix_start, best, best_start, best_end)
+# Indices are positions in the whole sequence, and ranges are inclusive.
+Summary = typing.Tuple[int, int, int, int, int, int, int, int]
+
+# (best, start, end)
+SumRange = typing.Tuple[int, int, int]
 
 def mcs_linear(nums: IntArray) -> int:
     """
@@ -49,6 +70,369 @@ def mcs_quadratic(nums: IntArray) -> int:
 
     return max_sum
 
+def summarize(nums: typing.Any, offset: int = 0) -> Summary:
+    """
+    Calculate the mergeable summary of a non-empty chunk of integers, whose
+    first element is at position offset of the whole sequence. Uses NumPy
+    prefix sums: the best sum ending at j is prefix[j] minus the smallest
+    prefix sum before j.
+    """
+
+    values = np.asarray(nums, dtype=np.int64)
+    cumsum = np.cumsum(values)
+    total = int(cumsum[-1])
+    before = np.concatenate(([0], cumsum[:-1]))
+
+    prefix_end = int(np.argmax(cumsum))
+    suffix_start = int(np.argmax(total - before))
+
+    min_before = np.minimum.accumulate(before)
+    best_end = int(np.argmax(cumsum - min_before))
+    best_start = int(np.argmin(before[:best_end + 1]))
+
+    return (total,
+            int(cumsum[prefix_end]), offset + prefix_end,
+            total - int(before[suffix_start]), offset + suffix_start,
+            int(cumsum[best_end] - before[best_start]), offset + best_start, offset + best_end)
+
+def merge_summaries(left: Summary, right: Summary) -> Summary:
+    """
+    Merge summaries of two adjacent chunks, left chunk first.
+    Merging is associative, so chunks can be combined in any grouping.
+    """
+
+    l_total, l_prefix, l_prefix_end, l_suffix, l_suffix_start, l_best, l_start, l_end = left
+    r_total, r_prefix, r_prefix_end, r_suffix, r_suffix_start, r_best, r_start, r_end = right
+
+    prefix, prefix_end = l_prefix, l_prefix_end
+    if l_total + r_prefix > prefix:
+        prefix, prefix_end = l_total + r_prefix, r_prefix_end
+
+    suffix, suffix_start = r_suffix, r_suffix_start
+    if r_total + l_suffix >= suffix:
+        suffix, suffix_start = r_total + l_suffix, l_suffix_start
+
+    best, best_start, best_end = l_best, l_start, l_end
+    if l_suffix + r_prefix > best:
+        best, best_start, best_end = l_suffix + r_prefix, l_suffix_start, r_prefix_end
+    if r_best > best:
+        best, best_start, best_end = r_best, r_start, r_end
+
+    return (l_total + r_total, prefix, prefix_end, suffix, suffix_start, best, best_start, best_end)
+
+def mcs_indices(nums: IntArray) -> SumRange:
+    """
+    Calculate maximum contiguous sum, and the inclusive start and end
+    indices of the sub range. Return (0, -1, -1) for an empty sequence.
+    """
+
+    if len(nums) == 0:
+        return 0, -1, -1
+    return summarize(nums)[5:]
+
+def _summarize_range(source: typing.Any, start: int, stop: int) -> Summary:
+    """
+    Summarize source[start:stop], opening source first if it is a file path.
+    """
+
+    if isinstance(source, str):
+        source = load_sequence(source)
+    return summarize(source[start:stop], start)
+
+def load_sequence(path: str) -> np.ndarray:
+    """
+    Memory-map a sequence of integers from a .npy file, or from a raw
+    file of native int64 values.
+    """
+
+    if path.endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+    return np.memmap(path, dtype=np.int64, mode="r")
+
+def mcs_parallel(source: typing.Any, chunk_size: int = 1 << 22, workers: int = 0) -> SumRange:
+    """
+    Calculate maximum contiguous sum and its indices by summarizing chunks
+    across a process pool of workers processes (default cpu count), then
+    merging the chunk summaries in order. Source is a sequence, array,
+    or path of a file to memory-map; for files, each worker maps the file
+    itself rather than receiving the chunk data.
+    """
+
+    size: int = len(load_sequence(source)) if isinstance(source, str) else len(source)
+    if size == 0:
+        return 0, -1, -1
+    if not isinstance(source, str):
+        source = np.asarray(source)
+
+    starts: IntArray = list(range(0, size, chunk_size))
+    stops: IntArray = [min(start + chunk_size, size) for start in starts]
+    if isinstance(source, str):
+        summarize_ftn, args = _summarize_range, ([source] * len(starts), starts, stops)
+    else:
+        summarize_ftn, args = summarize, ([source[start:stop] for start, stop in zip(starts, stops)], starts)
+
+    if workers == 1 or len(starts) == 1:
+        summaries: list = list(map(summarize_ftn, *args))
+    else:
+        with futures.ProcessPoolExecutor(max_workers=workers or None) as pool:
+            summaries = list(pool.map(summarize_ftn, *args))
+
+    result: Summary = summaries[0]
+    for summary in summaries[1:]:
+        result = merge_summaries(result, summary)
+    return result[5:]
+
+# (best, top, left, bottom, right), with inclusive rows and columns
+RectRange = typing.Tuple[int, int, int, int, int]
+
+EMPTY_RECT: Final = (0, -1, -1, -1, -1)
+
+def load_matrix(source: typing.Any) -> np.ndarray:
+    """
+    Return source as a 2D array, memory-mapping it if source is the path
+    of a .npy file.
+    """
+
+    if isinstance(source, str):
+        return np.load(source, mmap_mode="r")
+    return np.asarray(source)
+
+def mcs2d_reference(matrix: typing.Any) -> int:
+    """
+    Calculate maximum sum subrectangle with plain Python loops, running
+    mcs_linear over the column sums of every row pair.
+    Complexity: O(rows^2 * cols)
+    """
+
+    rows: IntMatrix = [list(row) for row in matrix]
+    if not rows or not rows[0]:
+        return 0
+
+    best: int = rows[0][0]
+    for top in range(len(rows)):
+        sums: IntArray = [0] * len(rows[0])
+        for bottom in range(top, len(rows)):
+            row = rows[bottom]
+            for col in range(len(sums)):
+                sums[col] += row[col]
+            best = max(best, mcs_linear(sums))
+    return best
+
+def prefix_table(matrix: np.ndarray) -> np.ndarray:
+    """
+    Return the 2D prefix sum table of matrix, where table[r][c] is the sum
+    of matrix[:r, :c].
+    """
+
+    nrows, ncols = matrix.shape
+    table = np.zeros((nrows + 1, ncols + 1), dtype=np.int64)
+    np.cumsum(matrix, axis=0, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+    return table
+
+def _best_rect_tops(source: typing.Any, tops: IntArray, block_size: int) -> RectRange:
+    """
+    Calculate maximum sum subrectangle whose top row is one of tops, given
+    the prefix sum table of the matrix, or the path of a .npy file holding
+    it, which is memory-mapped.
+
+    The column sum prefixes of rows top..bottom are table[bottom + 1] minus
+    table[top], so a block of bottom rows costs one subtraction. A
+    vectorized Kadane then finds the best sum of every row of the block at
+    once: the best sum ending at column j is prefix[j] minus the smallest
+    prefix before j, where prefix[0] is 0. The columns of the winning row
+    pair are recovered with summarize.
+    """
+
+    table = load_matrix(source)
+    nrows: int = table.shape[0] - 1
+
+    best: Optional[RectRange] = None
+    for top in tops:
+        for start in range(top, nrows, block_size):
+            stop: int = min(start + block_size, nrows)
+            prefix = table[start + 1:stop + 1] - table[top]
+            smallest = np.minimum.accumulate(prefix, axis=1)
+            np.subtract(prefix[:, 1:], smallest[:, :-1], out=prefix[:, 1:])
+            scores = prefix[:, 1:].max(axis=1)
+
+            row = int(np.argmax(scores))
+            if best is None or scores[row] > best[0]:
+                best = (int(scores[row]), top, -1, start + row, -1)
+
+    if best is None:
+        return EMPTY_RECT
+    _, top, _, bottom, _ = best
+    sums = np.diff(table[bottom + 1] - table[top])
+    total, left, right = summarize(sums)[5:]
+    return total, top, left, bottom, right
+
+def mcs2d(source: typing.Any, workers: int = 1, block_size: int = 0) -> RectRange:
+    """
+    Calculate maximum sum subrectangle of a 2D integer array, or of a .npy
+    file which is memory-mapped, and its inclusive (top, left, bottom,
+    right) coordinates. Return (0, -1, -1, -1, -1) for an empty array.
+
+    The shorter side is used as rows, so the row pairs number min^2 / 2.
+    The prefix sum table is built once. With workers other than 1, it is
+    written to a temporary .npy file, which every worker memory-maps, and
+    top rows are dealt round robin to a process pool of workers processes
+    (0 for cpu count), which balances the work of long and short row ranges.
+    Complexity: O(min(rows, cols)^2 * max(rows, cols))
+    """
+
+    matrix = load_matrix(source)
+    if matrix.ndim != 2 or matrix.size == 0:
+        return EMPTY_RECT
+
+    transpose: bool = matrix.shape[0] > matrix.shape[1]
+    table = prefix_table(matrix.T if transpose else matrix)
+    nrows, ncols = table.shape[0] - 1, table.shape[1] - 1
+    block_size = block_size or max(1, (1 << 20) // ncols)
+
+    if workers == 1:
+        result = _best_rect_tops(table, list(range(nrows)), block_size)
+    else:
+        nworkers: int = min(workers or os.cpu_count() or 1, nrows)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "prefix.npy")
+            np.save(path, table)
+            del table
+            with futures.ProcessPoolExecutor(max_workers=nworkers) as pool:
+                results = list(pool.map(_best_rect_tops,
+                                        [path] * nworkers,
+                                        [list(range(worker, nrows, nworkers)) for worker in range(nworkers)],
+                                        [block_size] * nworkers))
+        result = max(results, key=lambda rect: (rect[0], -rect[1]))
+
+    best, top, left, bottom, right = result
+    if transpose:
+        return best, left, top, right, bottom
+    return result
+
+class MCSStream:
+    """
+    This class calculates maximum contiguous sum over unbounded input, fed
+    in chunks. Only the running summary of everything seen so far is kept.
+    """
+
+    def __init__(self) -> None:
+        self.summary: Optional[Summary] = None
+        self.size: int = 0
+
+    def update(self, nums: typing.Any) -> None:
+        if len(nums) == 0:
+            return
+        summary: Summary = summarize(nums, self.size)
+        self.summary = summary if self.summary is None else merge_summaries(self.summary, summary)
+        self.size += len(nums)
+
+    def result(self) -> SumRange:
+        if self.summary is None:
+            return 0, -1, -1
+        return self.summary[5:]
+
+class MCSTree:
+    """
+    This class is a segment tree of chunk summaries, answering maximum
+    contiguous sum queries over any range [left, right] of a fixed length
+    sequence in O(log n), with point updates in O(log n). The tree is built
+    in O(n), one level at a time, by merging summary arrays with NumPy.
+    """
+
+    # Summary of padding leaves; merging it on the right leaves a summary unchanged
+    EMPTY: Final = -(1 << 61)
+
+    def __init__(self, nums: typing.Any) -> None:
+        values = np.asarray(nums, dtype=np.int64)
+        self.size: int = len(values)
+        self.capacity: int = 1 << max(self.size - 1, 0).bit_length()
+        self.nodes = np.full((8, 2 * self.capacity), -1, dtype=np.int64)
+
+        leaves = self.nodes[:, self.capacity:]
+        indices = np.arange(self.size)
+        leaves[0, self.size:] = 0
+        leaves[[1, 3, 5], self.size:] = MCSTree.EMPTY
+        leaves[[0, 1, 3, 5], :self.size] = values
+        leaves[[2, 4, 6, 7], :self.size] = indices
+
+        level: int = self.capacity
+        while level > 1:
+            self.nodes[:, level // 2:level] = self._merge_levels(self.nodes[:, level:2 * level:2],
+                                                                 self.nodes[:, level + 1:2 * level:2])
+            level //= 2
+
+    @staticmethod
+    def _merge_levels(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+        """
+        Vectorized merge_summaries over columns of summary arrays.
+        """
+
+        l_total, l_prefix, l_prefix_end, l_suffix, l_suffix_start, l_best, l_start, l_end = left
+        r_total, r_prefix, r_prefix_end, r_suffix, r_suffix_start, r_best, r_start, r_end = right
+
+        take_right = l_total + r_prefix > l_prefix
+        take_left = r_total + l_suffix >= r_suffix
+        cross = l_suffix + r_prefix
+        use_cross = cross > l_best
+        best = np.where(use_cross, cross, l_best)
+        use_right = r_best > best
+
+        return np.stack([
+            l_total + r_total,
+            np.where(take_right, l_total + r_prefix, l_prefix),
+            np.where(take_right, r_prefix_end, l_prefix_end),
+            np.where(take_left, r_total + l_suffix, r_suffix),
+            np.where(take_left, l_suffix_start, r_suffix_start),
+            np.where(use_right, r_best, best),
+            np.where(use_right, r_start, np.where(use_cross, l_suffix_start, l_start)),
+            np.where(use_right, r_end, np.where(use_cross, r_prefix_end, l_end))])
+
+    def _node(self, idx: int) -> Summary:
+        return tuple(self.nodes[:, idx].tolist())
+
+    def query(self, left: int, right: int) -> SumRange:
+        """
+        Calculate maximum contiguous sum of the inclusive range [left, right],
+        and the start and end indices of the best sub range.
+        """
+
+        assert 0 <= left <= right < self.size
+        left_summary: Optional[Summary] = None
+        right_summary: Optional[Summary] = None
+        lo: int = left + self.capacity
+        hi: int = right + self.capacity + 1
+        while lo < hi:
+            if lo & 1:
+                node = self._node(lo)
+                left_summary = node if left_summary is None else merge_summaries(left_summary, node)
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                node = self._node(hi)
+                right_summary = node if right_summary is None else merge_summaries(node, right_summary)
+            lo //= 2
+            hi //= 2
+
+        if left_summary is None:
+            return right_summary[5:]
+        if right_summary is None:
+            return left_summary[5:]
+        return merge_summaries(left_summary, right_summary)[5:]
+
+    def update(self, idx: int, value: int) -> None:
+        """
+        Set sequence element at idx to value.
+        """
+
+        assert 0 <= idx < self.size
+        node: int = idx + self.capacity
+        self.nodes[:, node] = (value, value, idx, value, idx, value, idx, idx)
+        node //= 2
+        while node >= 1:
+            self.nodes[:, node] = merge_summaries(self._node(2 * node), self._node(2 * node + 1))
+            node //= 2
+
 def test_mcs(nums: IntArray, mcs_actual: int) -> None:
     """
     Calculate maximum contiguous sum, using both linear and quadratic functions,
@@ -59,8 +443,107 @@ def test_mcs(nums: IntArray, mcs_actual: int) -> None:
     print("MCS Actual:", mcs_actual)
     print("MCS Linear:", mcs_linear(nums))
     print("MCS Quadra:", mcs_quadratic(nums))
+    print("MCS Ranged:", mcs_indices(nums))
+    print("MCS Parall:", mcs_parallel(nums, chunk_size=3, workers=1))
+
+    stream = MCSStream()
+    for i in range(0, len(nums), 2):
+        stream.update(nums[i:i + 2])
+    print("MCS Stream:", stream.result())
+
+    tree = MCSTree(nums)
+    print("MCS Tree  :", tree.query(0, len(nums) - 1), tree.query(1, len(nums) - 2))
+
+def test_mcs2d(trials: int = 50) -> None:
+    """
+    Check mcs2d against mcs2d_reference on random matrices of various
+    shapes, and check the sum of each returned rectangle.
+    """
+
+    rng = np.random.default_rng(trials)
+    for trial in range(trials):
+        matrix = rng.integers(-20, 10, (rng.integers(1, 12), rng.integers(1, 12)))
+        best, top, left, bottom, right = mcs2d(matrix, block_size=int(rng.integers(1, 5)))
+        assert best == mcs2d_reference(matrix.tolist()), f"trial {trial}"
+        assert best == int(matrix[top:bottom + 1, left:right + 1].sum()), f"trial {trial}"
+
+    matrix = rng.integers(-20, 10, (30, 20))
+    expect = mcs2d(matrix)
+    assert mcs2d(matrix, workers=2) == expect
+    assert mcs2d(matrix.T, workers=3)[0] == expect[0]
+    assert mcs2d(np.zeros((0, 3), dtype=np.int64)) == EMPTY_RECT
+    print("MCS 2D    :", expect)
+
+def bench_mcs2d(size: int = 300, workers: int = 0) -> None:
+    """
+    Time mcs2d, serial and across a process pool, against mcs2d_reference
+    on a random size x size matrix.
+    """
+
+    matrix = np.random.default_rng(size).integers(-100, 100, (size, size))
+
+    def timed(name: str, mcs_ftn) -> None:
+        start = time.perf_counter()
+        result = mcs_ftn()
+        print(f"{name}: size={size}x{size} result={result} time={time.perf_counter() - start:.4f}s")
+
+    timed("2D Reference", lambda: mcs2d_reference(matrix.tolist()))
+    timed("2D Serial   ", lambda: mcs2d(matrix))
+    timed("2D Parallel ", lambda: mcs2d(matrix, workers=workers))
+
+def bench_tree(size: int = 1000000, queries: int = 200) -> None:
+    """
+    Compare segment tree range queries against running mcs_linear on each slice.
+    """
+
+    nums = np.random.default_rng(size).integers(-100, 100, size)
+    values: IntArray = nums.tolist()
+    random.seed(size)
+    ranges: list = [sorted((random.randrange(size), random.randrange(size))) for _ in range(queries)]
+
+    start = time.perf_counter()
+    tree = MCSTree(nums)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tree_results: IntArray = [tree.query(left, right)[0] for left, right in ranges]
+    tree_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    linear_results: IntArray = [mcs_linear(values[left:right + 1]) for left, right in ranges]
+    linear_time = time.perf_counter() - start
+
+    print(f"Tree  : size={size} queries={queries} build={build_time:.4f}s query={tree_time:.4f}s")
+    print(f"Linear: size={size} queries={queries} query={linear_time:.4f}s match={tree_results == linear_results}")
+
+def bench_mcs(size: int = 10000000) -> None:
+    """
+    Time maximum contiguous sum on a large random sequence.
+    """
+
+    nums = np.random.default_rng(size).integers(-100, 100, size)
+
+    def timed(name: str, mcs_ftn) -> None:
+        start = time.perf_counter()
+        result = mcs_ftn()
+        print(f"{name}: size={size} result={result} time={time.perf_counter() - start:.4f}s")
+
+    timed("Linear  ", lambda: mcs_linear(nums.tolist()))
+    timed("Indices ", lambda: mcs_indices(nums))
+    timed("Parallel", lambda: mcs_parallel(nums, chunk_size=size // 8))
 
 if __name__ == "__main__":
-    test_mcs([1, -2, 3, 2, -1], 5)
-    test_mcs([-3, 1, -2, 2, 3, 1, -5, 3, 2], 6)
-    test_mcs([6, -5, -8, 9, 7, 10, 4, -3, 8, -5], 35)
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        bench_mcs()
+        bench_tree()
+        bench_mcs2d()
+    elif len(sys.argv) > 2 and sys.argv[1] == "bench2d":
+        matrix = np.random.default_rng(0).integers(-100, 100, (int(sys.argv[2]), int(sys.argv[2])))
+        start = time.perf_counter()
+        print(mcs2d(matrix, workers=int(sys.argv[3]) if len(sys.argv) > 3 else 0),
+              f"time={time.perf_counter() - start:.4f}s")
+    else:
+        test_mcs([1, -2, 3, 2, -1], 5)
+        test_mcs([-3, 1, -2, 2, 3, 1, -5, 3, 2], 6)
+        test_mcs([6, -5, -8, 9, 7, 10, 4, -3, 8, -5], 35)
+        test_mcs2d()
@@ -12,10 +12,27 @@ For instance, the following matrix contains 2 islands.
 
 """
 
-from puzzle_types import IntMatrix, GraphMap, VertexSet, Final
+from __future__ import annotations
+
+import sys
+import time
+import random
+import typing
+from array import array
+from concurrent import futures
+from puzzle_types import lazy_import, IntArray, IntMatrix, IntMap, GraphMap, VertexSet, Final
+
+if typing.TYPE_CHECKING:
+    import numpy as np
+else:
+    np = lazy_import("numpy")
 
 ISLAND: Final = 1
 
+# (area, min_row, min_col, max_row, max_col)
+IslandInfo = typing.Tuple[int, int, int, int, int]
+IslandGenerator = typing.Generator[IslandInfo, None, None]
+
 def make_graph(world: IntMatrix) -> GraphMap:
     """
     Generate a graph of the world from the 2D matrix of 0s and 1s.
@@ -92,14 +109,399 @@ def find_connected(graph: GraphMap, from_vertex: int) -> VertexSet:
 
     return visited
 
+def find_root(parents: IntArray, vertex: int) -> int:
+    """
+    Find union-find root of vertex, halving the path along the way.
+    """
+
+    while parents[vertex] != vertex:
+        parents[vertex] = parents[parents[vertex]]
+        vertex = parents[vertex]
+    return vertex
+
+def union_roots(parents: IntArray, vertex1: int, vertex2: int) -> bool:
+    """
+    Merge the sets containing the two vertices.
+    Return True if they were in different sets.
+    """
+
+    root1: int = find_root(parents, vertex1)
+    root2: int = find_root(parents, vertex2)
+    if root1 == root2:
+        return False
+    if root1 < root2:
+        parents[root2] = root1
+    else:
+        parents[root1] = root2
+    return True
+
+def make_parents(size: int) -> IntArray:
+    """
+    Create a flat union-find parents array, where each vertex is its own root.
+    """
+
+    return array('i' if size < 2**31 else 'q', range(size))
+
+def count_islands_direct(world: IntMatrix) -> int:
+    """
+    Calculate the number of islands directly from the 2D matrix, without
+    building a graph. A single pass unions every land cell with its already
+    visited neighbors (left, up-left, up, up-right) in a flat union-find
+    array, so worlds may be rectangular. Complexity: O(rows * cols)
+    """
+
+    rows: int = len(world)
+    cols: int = len(world[0]) if rows > 0 else 0
+    parents: IntArray = make_parents(rows * cols)
+    count: int = 0
+
+    for i in range(rows):
+        row = world[i]
+        prev_row = world[i - 1] if i > 0 else None
+        for j in range(cols):
+            if row[j] != ISLAND:
+                continue
+            count += 1
+            vertex: int = i * cols + j
+            if j > 0 and row[j - 1] == ISLAND:
+                count -= union_roots(parents, vertex, vertex - 1)
+            if prev_row is not None:
+                for dj in (-1, 0, 1):
+                    if 0 <= j + dj < cols and prev_row[j + dj] == ISLAND:
+                        count -= union_roots(parents, vertex, vertex - cols + dj)
+
+    return count
+
+def stream_islands(rows: typing.Iterable[IntArray]) -> IslandGenerator:
+    """
+    Read the world matrix row by row and generate (area, min_row, min_col,
+    max_row, max_col) for each island as soon as it is complete. Only the
+    previous row labels and a union-find of the components touching the
+    current row are kept, so memory is O(cols) regardless of the number of rows.
+    """
+
+    parents: IntMap = {}
+    infos: dict = {}
+    prev_labels: IntArray = []
+    next_label: int = 1
+
+    def find(label: int) -> int:
+        while parents[label] != label:
+            parents[label] = parents[parents[label]]
+            label = parents[label]
+        return label
+
+    def union(label1: int, label2: int) -> int:
+        root1, root2 = find(label1), find(label2)
+        if root1 != root2:
+            info1, info2 = infos.pop(root2), infos[root1]
+            infos[root1] = [info1[0] + info2[0],
+                            min(info1[1], info2[1]), min(info1[2], info2[2]),
+                            max(info1[3], info2[3]), max(info1[4], info2[4])]
+            parents[root2] = root1
+        return root1
+
+    i: int = -1
+    for i, row in enumerate(rows):
+        cols: int = len(row)
+        labels: IntArray = [0] * cols
+        for j in range(cols):
+            if row[j] != ISLAND:
+                continue
+            label: int = 0
+            neighbors = [labels[j - 1] if j > 0 else 0]
+            if prev_labels:
+                neighbors.extend(prev_labels[max(j - 1, 0):j + 2])
+            for neighbor in neighbors:
+                if neighbor:
+                    label = union(label, neighbor) if label else find(neighbor)
+            if not label:
+                label = next_label
+                next_label += 1
+                parents[label] = label
+                infos[label] = [0, i, j, i, j]
+            info = infos[label]
+            info[0] += 1
+            info[3] = i
+            info[2] = min(info[2], j)
+            info[4] = max(info[4], j)
+            labels[j] = label
+
+        labels = [find(label) if label else 0 for label in labels]
+        active: VertexSet = set(labels)
+        active.discard(0)
+        for label in set(prev_labels) - {0}:
+            root: int = find(label)
+            if root not in active and root in infos:
+                yield tuple(infos.pop(root))
+
+        parents = {label: label for label in active}
+        infos = {label: infos[label] for label in active}
+        prev_labels = labels
+
+    for label in set(prev_labels) - {0}:
+        yield tuple(infos[label])
+
+def count_islands_stream(rows: typing.Iterable[IntArray]) -> int:
+    """
+    Calculate the number of islands reading the world matrix row by row.
+    """
+
+    return sum(1 for _ in stream_islands(rows))
+
+def read_rows(path: str) -> typing.Iterable[IntArray]:
+    """
+    Read world matrix rows from a file without loading the whole matrix.
+    A .npy file is memory-mapped, and any other file is read as text with
+    one row of 0s and 1s per line, optionally separated by spaces or commas.
+    """
+
+    if path.endswith(".npy"):
+        yield from np.load(path, mmap_mode="r")
+        return
+
+    with open(path) as world_file:
+        for line in world_file:
+            cells: str = "".join(line.replace(",", " ").split())
+            if cells:
+                yield [int(cell) for cell in cells]
+
+class IslandMap:
+    """
+    This class keeps the number of islands of a world matrix up to date while
+    cells are flipped between water and land. Adding land unions the cell with
+    its land neighbors in a flat union-find array. Removing land relabels only
+    the cells of the island the removed cell belonged to.
+    """
+
+    def __init__(self, world: IntMatrix) -> None:
+        self.rows: int = len(world)
+        self.cols: int = len(world[0]) if self.rows > 0 else 0
+        self.world: list = [bytearray(self.cols) for _ in range(self.rows)]
+        self.parents: IntArray = make_parents(self.rows * self.cols)
+        self.islands: int = 0
+        for i in range(self.rows):
+            for j in range(self.cols):
+                if world[i][j] == ISLAND:
+                    self.add_land(i, j)
+
+    def count(self) -> int:
+        return self.islands
+
+    def is_land(self, i: int, j: int) -> bool:
+        return self.world[i][j] == ISLAND
+
+    def add_land(self, i: int, j: int) -> None:
+        """
+        Turn cell into land. Amortized near constant time.
+        """
+
+        if self.is_land(i, j):
+            return
+        self.world[i][j] = ISLAND
+        self.islands += 1
+        vertex: int = i * self.cols + j
+        for ni, nj in self._land_neighbors(i, j):
+            self.islands -= union_roots(self.parents, vertex, ni * self.cols + nj)
+
+    def remove_land(self, i: int, j: int) -> None:
+        """
+        Turn cell into water, and relabel the rest of its island.
+        """
+
+        if self.is_land(i, j):
+            self._remove_all([(i, j)])
+
+    def flip(self, i: int, j: int) -> None:
+        if self.is_land(i, j):
+            self.remove_land(i, j)
+        else:
+            self.add_land(i, j)
+
+    def apply(self, flips: typing.Iterable[typing.Tuple[int, int]]) -> int:
+        """
+        Flip many cells at once, and return the new number of islands.
+        All removals share a single relabeling pass over the affected islands,
+        then additions are unioned in.
+        """
+
+        changed: set = set()
+        for cell in flips:
+            changed ^= {cell}
+        added: list = [cell for cell in changed if not self.is_land(*cell)]
+        self._remove_all([cell for cell in changed if self.is_land(*cell)])
+        for i, j in added:
+            self.add_land(i, j)
+        return self.islands
+
+    def _land_neighbors(self, i: int, j: int) -> typing.Iterator[typing.Tuple[int, int]]:
+        for ni in range(max(i - 1, 0), min(i + 2, self.rows)):
+            row = self.world[ni]
+            for nj in range(max(j - 1, 0), min(j + 2, self.cols)):
+                if row[nj] == ISLAND and (ni, nj) != (i, j):
+                    yield ni, nj
+
+    def _remove_all(self, cells: list) -> None:
+        """
+        Turn land cells into water, then flood fill what remains of their
+        islands, resetting union-find parents to each new island's first cell.
+        """
+
+        affected: VertexSet = {find_root(self.parents, i * self.cols + j) for i, j in cells}
+        self.islands -= len(affected)
+
+        for i, j in cells:
+            self.world[i][j] = 0
+            self.parents[i * self.cols + j] = i * self.cols + j
+
+        visited: VertexSet = set()
+        for i, j in cells:
+            for seed in self._land_neighbors(i, j):
+                seed_vertex: int = seed[0] * self.cols + seed[1]
+                if seed_vertex in visited:
+                    continue
+                visited.add(seed_vertex)
+                self.islands += 1
+                to_visit: list = [seed]
+                while to_visit:
+                    ci, cj = to_visit.pop()
+                    self.parents[ci * self.cols + cj] = seed_vertex
+                    for ni, nj in self._land_neighbors(ci, cj):
+                        if ni * self.cols + nj not in visited:
+                            visited.add(ni * self.cols + nj)
+                            to_visit.append((ni, nj))
+
+def label_islands_numpy(world: IntMatrix) -> typing.Tuple[np.ndarray, int]:
+    """
+    Label islands with NumPy. Every land cell starts with its own flat index
+    plus one as label, and labels form a parent array. Each iteration takes
+    the minimum label over the 3x3 neighborhood using shifted arrays, hooks
+    each label onto that smaller neighbor label, then pointer jumps until
+    every label points at its root. Iterates until neighbors agree.
+    Return a pair; label matrix (0 for water), and number of islands.
+    """
+
+    land = np.asarray(world) == ISLAND
+    rows, cols = land.shape
+    water: int = rows * cols + 1
+    own = np.where(land, np.arange(1, rows * cols + 1).reshape(rows, cols), water)
+    parents = np.arange(water + 1)
+    labels = own
+
+    while True:
+        padded = np.pad(labels, 1, constant_values=water)
+        neighbor_min = labels.copy()
+        for di in range(3):
+            for dj in range(3):
+                np.minimum(neighbor_min, padded[di:di + rows, dj:dj + cols], out=neighbor_min)
+        changed = land & (neighbor_min < labels)
+        if not np.any(changed):
+            break
+
+        np.minimum.at(parents, labels[changed], neighbor_min[changed])
+        while True:
+            next_parents = parents[parents]
+            if np.array_equal(next_parents, parents):
+                break
+            parents = next_parents
+        labels = parents[own]
+
+    labels = np.where(land, labels, 0)
+    count: int = int(np.count_nonzero(land & (labels == own)))
+    return labels, count
+
+def count_islands_numpy(world: IntMatrix) -> int:
+    """
+    Calculate the number of islands using NumPy label propagation.
+    """
+
+    return label_islands_numpy(world)[1]
+
+def _label_tile(tile: np.ndarray) -> tuple:
+    """
+    Label one tile, and return its island count and its border labels,
+    numbered 1..count (0 for water): top row, bottom row, left column, right column.
+    """
+
+    labels, count = label_islands_numpy(tile)
+    _, compact = np.unique(labels, return_inverse=True)
+    compact = compact.reshape(labels.shape).astype(np.int32)
+    if not np.any(labels == 0):
+        compact += 1
+    return count, compact[0], compact[-1], compact[:, 0], compact[:, -1]
+
+def _seam_pairs(side1: np.ndarray, side2: np.ndarray) -> np.ndarray:
+    """
+    Collect label pairs of land cells facing each other across a seam,
+    including the diagonal neighbors.
+    """
+
+    size: int = len(side1)
+    pairs: list = []
+    for shift in (-1, 0, 1):
+        first = side1[max(0, -shift):size - max(0, shift)]
+        second = side2[max(0, shift):size - max(0, -shift)]
+        both = (first > 0) & (second > 0)
+        pairs.append(np.stack([first[both], second[both]], axis=1))
+    return np.unique(np.concatenate(pairs), axis=0)
+
+def count_islands_tiled(world: IntMatrix, tile_size: int = 1024, workers: int = 0) -> int:
+    """
+    Calculate the number of islands by labeling tiles independently across
+    a process pool of workers processes (default cpu count), then merging
+    labels of islands which touch across tile seams with a union-find pass.
+    """
+
+    world = np.asarray(world)
+    rows, cols = world.shape
+    row_starts: IntArray = list(range(0, rows, tile_size))
+    col_starts: IntArray = list(range(0, cols, tile_size))
+    tiles: list = [world[i:i + tile_size, j:j + tile_size] for i in row_starts for j in col_starts]
+
+    if workers == 1 or len(tiles) <= 1:
+        results: list = [_label_tile(tile) for tile in tiles]
+    else:
+        with futures.ProcessPoolExecutor(max_workers=workers or None) as pool:
+            results = list(pool.map(_label_tile, tiles))
+
+    # Offset tile labels so they are unique across the world
+    offset: int = 0
+    borders: list = []
+    for count, top, bottom, left, right in results:
+        borders.append([np.where(side > 0, side + offset, 0) for side in (top, bottom, left, right)])
+        offset += count
+
+    ntile_cols: int = len(col_starts)
+    pairs: list = []
+    for ti in range(len(row_starts) - 1):
+        bottom = np.concatenate([borders[ti * ntile_cols + tj][1] for tj in range(ntile_cols)])
+        top = np.concatenate([borders[(ti + 1) * ntile_cols + tj][0] for tj in range(ntile_cols)])
+        pairs.append(_seam_pairs(bottom, top))
+    for tj in range(ntile_cols - 1):
+        right = np.concatenate([borders[ti * ntile_cols + tj][3] for ti in range(len(row_starts))])
+        left = np.concatenate([borders[ti * ntile_cols + tj + 1][2] for ti in range(len(row_starts))])
+        pairs.append(_seam_pairs(right, left))
+
+    parents: IntArray = make_parents(offset + 1)
+    merged: int = 0
+    for seam in pairs:
+        for label1, label2 in seam.tolist():
+            merged += union_roots(parents, label1, label2)
+
+    return offset - merged
+
 def test_islands() -> None:
     """
     Test number of islands.
     """
 
     def test_case(name: str, actual_count: int, world_map: IntMatrix) -> None:
-        count = count_islands(make_graph(world_map))
-        print(f"{name}: count={count} actual={actual_count}")
+        count = count_islands(make_graph(world_map)) if len(world_map) == len(world_map[0]) else None
+        direct = count_islands_direct(world_map)
+        stream = count_islands_stream(world_map)
+        numpy = count_islands_numpy(world_map)
+        tiled = count_islands_tiled(world_map, tile_size=2, workers=1)
+        print(f"{name}: count={count} direct={direct} stream={stream} numpy={numpy} tiled={tiled} actual={actual_count}")
 
     test_case("test1", 1,
               [[1, 0],
@@ -125,5 +527,52 @@ def test_islands() -> None:
                [0, 0, 0, 0, 0],
                [0, 1, 0, 0, 1]])
 
+    test_case("test5", 3,
+              [[1, 0, 0, 1, 1, 0, 1],
+               [0, 1, 0, 0, 1, 0, 1],
+               [1, 0, 0, 0, 0, 0, 1]])
+
+def test_island_map() -> None:
+    """
+    Test incremental island count under cell flips.
+    """
+
+    island_map = IslandMap([[1, 1, 1, 0, 0],
+                            [0, 0, 1, 0, 1],
+                            [1, 1, 1, 0, 1]])
+    print(f"IslandMap: count={island_map.count()} actual=2")
+    island_map.remove_land(1, 2)
+    print(f"Remove (1, 2): count={island_map.count()} actual=3")
+    island_map.add_land(0, 3)
+    print(f"Add (0, 3): count={island_map.count()} actual=2")
+    count = island_map.apply([(1, 3), (2, 4), (1, 4), (0, 0), (0, 0)])
+    print(f"Apply: count={count} actual=1")
+
+def bench_islands(size: int = 1000, graph_size: int = 200) -> None:
+    """
+    Compare island counting modes on a random size x size world. The graph
+    based count_islands path is timed on a smaller graph_size world.
+    """
+
+    def timed(name: str, world: IntMatrix, count_ftn) -> None:
+        start = time.perf_counter()
+        count = count_ftn(world)
+        print(f"{name}: size={len(world)} count={count} time={time.perf_counter() - start:.4f}s")
+
+    random.seed(size)
+    small: IntMatrix = [[int(random.random() < 0.4) for _ in range(graph_size)] for _ in range(graph_size)]
+    timed("Graph ", small, lambda world: count_islands(make_graph(world)))
+    timed("Direct", small, count_islands_direct)
+    timed("NumPy ", small, count_islands_numpy)
+
+    large = (np.random.default_rng(size).random((size, size)) < 0.4).astype(np.int8)
+    timed("Direct", large.tolist(), count_islands_direct)
+    timed("NumPy ", large, count_islands_numpy)
+    timed("Tiled ", large, lambda world: count_islands_tiled(world, tile_size=256))
+
 if __name__ == "__main__":
-    test_islands()
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        bench_islands()
+    else:
+        test_islands()
+        test_island_map()
@@ -18,15 +18,40 @@ This yields Fc * 4r^2 = pi * r^2, which reduces
 to pi = 4 * Fc.
 
 Implementation will assume r = 1.
+
+Besides plain pseudo-random sampling, points can be sampled with variance
+reduction (stratified jittered grid, antithetic pairs) or from randomized
+low-discrepancy sequences (Halton, scrambled Sobol), which reach a given
+precision with far fewer samples.
 """
 
+from __future__ import annotations
+
 import math
 import random
 import sys
-import numpy as np
-from typing import Tuple
+import time
+import typing
+from typing import Final, Optional, Tuple
+from puzzle_types import lazy_import
+
+if typing.TYPE_CHECKING:
+    import numpy as np
+else:
+    np = lazy_import("numpy")
 
 Point = Tuple[float, float]
+if typing.TYPE_CHECKING:
+    PointArrays = Tuple[np.ndarray, np.ndarray]
+
+RANDOM: Final = "random"
+UNIFORM: Final = "uniform"
+STRATIFIED: Final = "stratified"
+ANTITHETIC: Final = "antithetic"
+HALTON: Final = "halton"
+SOBOL: Final = "sobol"
+
+METHODS: Final = (RANDOM, UNIFORM, STRATIFIED, ANTITHETIC, HALTON, SOBOL)
 
 def next_point() -> Point:
     """
@@ -43,26 +68,103 @@ def in_unit_circle(pt: Point) -> bool:
 
     return math.sqrt(pt[0]**2 + pt[1]**2) <= 1.0
 
+def radical_inverse(indices: np.ndarray, base: int) -> np.ndarray:
+    """
+    Van der Corput radical inverse of each index in given base, i.e.
+    the digits of the index mirrored around the decimal point.
+    """
+
+    result = np.zeros(len(indices))
+    scale = 1.0 / base
+    indices = indices.copy()
+    while np.any(indices > 0):
+        result += (indices % base) * scale
+        indices //= base
+        scale /= base
+    return result
+
+def sobol_2d(samples: int, rng: np.random.Generator) -> PointArrays:
+    """
+    First samples points of the 2D Sobol sequence, scrambled with a random
+    digital shift (xor of each coordinate with a random 32 bit integer).
+    Dimension 1 uses direction numbers 2^(32-k), dimension 2 uses primitive
+    polynomial x + 1, giving v_k = v_(k-1) xor (v_(k-1) >> 1).
+    """
+
+    indices = np.arange(samples, dtype=np.uint64)
+    x = np.zeros(samples, dtype=np.uint64)
+    y = np.zeros(samples, dtype=np.uint64)
+    direction_y = 1 << 31
+    for k in range(max(samples - 1, 1).bit_length()):
+        bits = (indices >> np.uint64(k)) & np.uint64(1)
+        x ^= bits * np.uint64(1 << (31 - k))
+        y ^= bits * np.uint64(direction_y)
+        direction_y ^= direction_y >> 1
+
+    shift = rng.integers(0, 1 << 32, size=2, dtype=np.uint64)
+    return (x ^ shift[0]) / 2.0**32, (y ^ shift[1]) / 2.0**32
+
+def sample_points(method: str, samples: int, rng: np.random.Generator) -> PointArrays:
+    """
+    Generate (x, y) point arrays in [0.0, 1.0) with given sampling method.
+    Stratified sampling rounds samples down to a square number, and
+    antithetic sampling rounds samples up to an even number.
+    """
+
+    if method == UNIFORM:
+        return rng.random(samples), rng.random(samples)
+
+    if method == STRATIFIED:
+        side = max(math.isqrt(samples), 1)
+        cells = np.arange(side * side)
+        return ((cells // side + rng.random(side * side)) / side,
+                (cells % side + rng.random(side * side)) / side)
+
+    if method == ANTITHETIC:
+        x, y = rng.random((samples + 1) // 2), rng.random((samples + 1) // 2)
+        return np.concatenate((x, 1.0 - x)), np.concatenate((y, 1.0 - y))
+
+    if method == HALTON:
+        indices = np.arange(1, samples + 1)
+        shift = rng.random(2)
+        return ((radical_inverse(indices, 2) + shift[0]) % 1.0,
+                (radical_inverse(indices, 3) + shift[1]) % 1.0)
+
+    if method == SOBOL:
+        return sobol_2d(samples, rng)
+
+    raise ValueError(f"Unknown sampling method {method}")
+
 def estimate_pi(samples: int = 1000000,
                 experiments: int = 1,
-                verbose: bool = False) -> Tuple[float, float]:
+                verbose: bool = False,
+                method: str = RANDOM,
+                seed: Optional[int] = None) -> Tuple[float, float]:
     """
     Estimate value of Pi using Monte Carlo method.
 
     samples: Number of random points to sample per experiment
     experiments: Number of experiments to perform
+    method: Sampling method, one of METHODS
+    seed: Seed for the NumPy sampling methods
 
     Return: Average of all experiments
     """
 
     pi_guesses = []
+    rng = np.random.default_rng(seed)
 
     for sim in range(1, experiments + 1):
         in_circle_cnt: int = 0
 
-        for _ in range(samples):
-            if in_unit_circle(next_point()):
-                in_circle_cnt += 1
+        if method == RANDOM:
+            for _ in range(samples):
+                if in_unit_circle(next_point()):
+                    in_circle_cnt += 1
+        else:
+            x, y = sample_points(method, samples, rng)
+            in_circle_cnt = int(np.count_nonzero(x * x + y * y <= 1.0))
+            samples = len(x)
 
         pi_estimate = 4.0 * in_circle_cnt / float(samples)
         pi_guesses.append(pi_estimate)
@@ -81,7 +183,8 @@ def test_pi() -> None:
     err = abs(math.pi - pi)
     print(f"\nPi = {pi}\nSD = {std}\nEr = {err}")
 
-def search_pi(precision: float, base_samples: int = 10000, experiments: int = 10, multiplier: int = 2, verbose: bool = False):
+def search_pi(precision: float, base_samples: int = 10000, experiments: int = 10, multiplier: int = 2,
+              verbose: bool = False, method: str = RANDOM):
     """
     Estimate pi using Monte Carlo estimater, doubling number of
     samples until specified precision is reached
@@ -93,15 +196,38 @@ def search_pi(precision: float, base_samples: int = 10000, experiments: int = 10
     stop_precision = precision / 2.0
 
     while std >= stop_precision:
-        pi, std = estimate_pi(samples=samples, experiments=experiments, verbose=verbose)
+        pi, std = estimate_pi(samples=samples, experiments=experiments, verbose=verbose, method=method)
         samples *= samples_multiplier
 
     err = abs(math.pi - pi)
 
     print(f"\nPi = {pi}\nSD = {std}\nEr = {err}")
 
+def bench_methods(sample_sizes: Tuple[int, ...] = (1000, 10000, 100000, 1000000),
+                  experiments: int = 20) -> None:
+    """
+    Compare sampling methods by root mean square error of single experiment
+    estimates and wall time, for increasing numbers of samples.
+    """
+
+    print("Method\tSamples\tRMSE\t\tTime")
+    for method in METHODS[1:]:
+        for samples in sample_sizes:
+            rng = np.random.default_rng(samples)
+            start = time.perf_counter()
+            errors = []
+            for _ in range(experiments):
+                x, y = sample_points(method, samples, rng)
+                errors.append(4.0 * np.count_nonzero(x * x + y * y <= 1.0) / len(x) - math.pi)
+            elapsed = (time.perf_counter() - start) / experiments
+            rmse = math.sqrt(sum(err * err for err in errors) / experiments)
+            print(f"{method}\t{samples}\t{rmse:.8f}\t{elapsed:.6f}s")
+
 if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "search":
-        search_pi(precision=0.005, base_samples=10000, experiments=100, verbose=True)
+        method = sys.argv[2] if len(sys.argv) > 2 else RANDOM
+        search_pi(precision=0.005, base_samples=10000, experiments=100, verbose=True, method=method)
+    elif len(sys.argv) > 1 and sys.argv[1] == "bench":
+        bench_methods()
     else:
         test_pi()
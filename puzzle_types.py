@@ -3,7 +3,9 @@ Module containing common typing components used by puzzle solutions
 in the misc_puzzles repo.
 """
 
+import sys
 import typing
+import importlib.util
 from typing import Final, Any, Optional, Tuple
 
 # -------------------------
@@ -44,3 +46,30 @@ EdgeArray = typing.MutableSequence[Edge]
 GraphMap = typing.MutableMapping[int, typing.MutableSequence[int]]
 
 BoolVerticesPair = typing.Tuple[bool, VertexSet]
+
+OptVertexArray = typing.Optional[VertexArray]
+
+# -------------------------
+# Lazy Imports
+
+def lazy_import(name: str) -> Any:
+    """
+    Return module which is only loaded when one of its attributes is first
+    accessed, so heavy dependencies (NumPy) do not slow down the startup
+    of scripts and code paths which do not use them. A submodule is also
+    bound on its parent package, as a regular import does.
+    """
+
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
@@ -0,0 +1,510 @@
+"""
+Long-lived local solver service for the puzzle solutions in the
+misc_puzzles repo, so callers do not pay interpreter startup and NumPy
+import per request.
+
+The server speaks newline delimited JSON over localhost TCP or a Unix
+socket. Each request is {"id": ..., "op": ..., "args": {...}}, and each
+response is {"id": ..., "result": ...} or {"id": ..., "error": ...}.
+
+Small solver requests are micro-batched: requests arriving within
+BATCH_DELAY seconds of each other, up to BATCH_SIZE, are sent to a warm
+process pool as one task. Requests whose estimated cost is over SMALL_COST
+are sent on their own to a second warm pool, which is recycled if one runs
+longer than SOLO_TIMEOUT. Requests over MAX_COST are rejected. Malformed requests get an error response
+with the request id, or a null id if the line is not a JSON object. The
+"metrics" op returns request counts, recent throughput, latency
+percentiles, and mean batch size.
+
+Usage:
+  python3 solver_service.py serve [<port>|<unix_socket_path>]
+  python3 solver_service.py load [<port>|<unix_socket_path>] [<concurrency>] [<requests>] [<op>]
+"""
+
+import sys
+import json
+import time
+import signal
+import asyncio
+import collections
+import statistics
+import typing
+from concurrent import futures
+from puzzle_types import Any, Final, Optional
+
+PORT: Final = 8765
+BATCH_SIZE: Final = 64
+BATCH_DELAY: Final = 0.002
+LATENCY_WINDOW: Final = 10000
+THROUGHPUT_WINDOW: Final = 1.0
+
+# Requests estimated to cost more than SMALL_COST work units (roughly
+# Python loop steps) run as their own pool task instead of joining a batch
+SMALL_COST: Final = 100000
+
+# Requests estimated to cost more than MAX_COST work units are rejected,
+# e.g. count_queens above size 15
+MAX_COST: Final = 20000000
+
+# Seconds a solo request may run before its pool is recycled
+SOLO_TIMEOUT: Final = 60.0
+
+Request = typing.Dict[str, Any]
+
+# --------------------------------------------------------------------------------
+# Operations, run in the worker processes
+
+def op_calc_dist(cw: int, boxes: list) -> int:
+    import box_packing
+    return box_packing.calc_dist(cw, [box_packing.make_box(tag, h, w) for tag, (h, w) in enumerate(boxes, start=1)])
+
+def op_pack_fleet(cw: int, max_height: int, boxes: list) -> list:
+    import box_packing
+    fleet = box_packing.pack_fleet(cw, max_height,
+                                   [box_packing.make_box(tag, h, w) for tag, (h, w) in enumerate(boxes, start=1)],
+                                   workers=1)
+    return [dict(boxes=[box_packing.box_tag(box) for box in container["boxes"]],
+                 dist=container["dist"],
+                 utilization=container["utilization"])
+            for container in fleet]
+
+def op_count_islands(world: list) -> int:
+    import number_of_islands
+    return number_of_islands.count_islands_direct(world)
+
+def op_has_cycle(vertices: list, edges: list) -> bool:
+    import graph_cycle
+    return graph_cycle.Graph(vertices, edges).has_cycle()
+
+def op_find_cycle(vertices: list, edges: list) -> Optional[list]:
+    import graph_cycle
+    return graph_cycle.Graph(vertices, edges).find_cycle()
+
+def op_generate_primes(max_int: int) -> list:
+    import generate_primes
+    return list(generate_primes.generate_primes(max_int))
+
+def op_estimate_pi(samples: int = 1000000, experiments: int = 1, method: str = "uniform") -> list:
+    import pi_monte_carlo
+    return list(pi_monte_carlo.estimate_pi(samples=samples, experiments=experiments, method=method))
+
+def op_count_queens(size: int = 8) -> int:
+    import eight_queens
+    return eight_queens.count_queens(size)
+
+def op_max_contiguous_sum(nums: list) -> list:
+    import max_contiguous_sum
+    return list(max_contiguous_sum.mcs_indices(nums))
+
+def op_count_steps(nsteps: int, steps: list = (1, 2, 3), modulus: Optional[int] = None) -> int:
+    import staircase_steps
+    return staircase_steps.count_steps_fast(nsteps, steps, modulus)
+
+def op_next_generation_rule(grid: list, rule: str = "B3/S23", generations: int = 1) -> list:
+    import game_of_life
+    import numpy
+    cells = (numpy.asarray(grid) == game_of_life.ON).astype(numpy.uint8)
+    table = game_of_life.rule_table(rule)
+    for _ in range(generations):
+        cells = game_of_life.step_cells(cells, table)
+    return cells.tolist()
+
+OPS: Final = {
+    "calc_dist": op_calc_dist,
+    "pack_fleet": op_pack_fleet,
+    "count_islands": op_count_islands,
+    "has_cycle": op_has_cycle,
+    "find_cycle": op_find_cycle,
+    "generate_primes": op_generate_primes,
+    "estimate_pi": op_estimate_pi,
+    "count_queens": op_count_queens,
+    "max_contiguous_sum": op_max_contiguous_sum,
+    "count_steps": op_count_steps,
+    "next_generation_rule": op_next_generation_rule,
+}
+
+# Estimated cost of each op from its args, in work units
+COSTS: Final = {
+    "calc_dist": lambda args: 400 * len(args["boxes"]) ** 2,
+    "pack_fleet": lambda args: 4000 * len(args["boxes"]) ** 2,
+    "count_islands": lambda args: 10 * sum(len(row) for row in args["world"]),
+    "has_cycle": lambda args: 10 * (len(args["vertices"]) + len(args["edges"])),
+    "find_cycle": lambda args: 10 * (len(args["vertices"]) + len(args["edges"])),
+    "generate_primes": lambda args: 10 * args["max_int"],
+    "estimate_pi": lambda args: args.get("samples", 1000000) * args.get("experiments", 1),
+    "count_queens": lambda args: 3 ** min(args.get("size", 8), 40),
+    "max_contiguous_sum": lambda args: len(args["nums"]),
+    "count_steps": lambda args: len(args.get("steps", (1, 2, 3))) ** 3 * int(args["nsteps"]).bit_length(),
+    "next_generation_rule": lambda args: len(args["grid"]) * len(args["grid"][0]) * args.get("generations", 1),
+}
+
+def request_cost(op: str, args: dict) -> int:
+    """
+    Return estimated cost of request, or 0 if its args are malformed, in
+    which case the worker reports the error.
+    """
+
+    try:
+        return int(COSTS[op](args))
+    except Exception:
+        return 0
+
+def warm_worker() -> None:
+    """
+    Pool initializer, importing the puzzle modules and NumPy up front.
+    """
+
+    import numpy
+    import box_packing, number_of_islands, graph_cycle, generate_primes
+    import pi_monte_carlo, eight_queens, max_contiguous_sum, staircase_steps, game_of_life
+
+def run_batch(batch: typing.List[typing.Tuple[str, dict]]) -> list:
+    """
+    Run a batch of (op, args) requests, returning ("result", value) or
+    ("error", message) for each.
+    """
+
+    results: list = []
+    for op, args in batch:
+        try:
+            results.append(("result", OPS[op](**args)))
+        except Exception as err:
+            results.append(("error", f"{type(err).__name__}: {err}"))
+    return results
+
+# --------------------------------------------------------------------------------
+# Server
+
+class SolverServer:
+    """
+    This class accepts client connections, queues small solver requests,
+    and dispatches them in micro-batches to a warm process pool. Large
+    requests are dispatched on their own to a separate solo pool, so they
+    do not hold up a batch of small ones, and a solo request that runs past
+    timeout can be stopped by recycling the solo pool without touching the
+    batches.
+    """
+
+    def __init__(self, workers: int = 0, timeout: float = SOLO_TIMEOUT) -> None:
+        self.workers: Optional[int] = workers or None
+        self.timeout: float = timeout
+        self.pool = futures.ProcessPoolExecutor(max_workers=self.workers, initializer=warm_worker)
+        self.solo_pool = futures.ProcessPoolExecutor(max_workers=self.workers, initializer=warm_worker)
+        self.queue: Optional[asyncio.Queue] = None
+        self.started: float = time.perf_counter()
+        self.requests: int = 0
+        self.errors: int = 0
+        self.batches: int = 0
+        self.batched: int = 0
+        self.solo: int = 0
+        self.timeouts: int = 0
+        self.latencies: typing.Deque[float] = collections.deque(maxlen=LATENCY_WINDOW)
+        self.completions: typing.Deque[float] = collections.deque(maxlen=LATENCY_WINDOW)
+
+    async def serve(self, address: str) -> None:
+        self.queue = asyncio.Queue()
+        if address.isdigit():
+            server = await asyncio.start_server(self.handle_client, "127.0.0.1", int(address))
+        else:
+            server = await asyncio.start_unix_server(self.handle_client, address)
+        print(f"Serving on {address}")
+
+        loop = asyncio.get_running_loop()
+        serve_task = asyncio.current_task()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, serve_task.cancel)
+        try:
+            async with server:
+                await asyncio.gather(server.serve_forever(), self.dispatch())
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """
+        Shut down both pools, terminating their workers, so none are left
+        running after the server stops.
+        """
+
+        for pool in (self.pool, self.solo_pool):
+            for process in list(getattr(pool, "_processes", {}).values()):
+                process.terminate()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        lock = asyncio.Lock()
+
+        async def respond(line: bytes) -> None:
+            request: Any = None
+            try:
+                request = json.loads(line)
+                response = await self.handle_request(request)
+            except Exception as err:
+                self.errors += 1
+                request_id = request.get("id") if isinstance(request, dict) else None
+                response = {"id": request_id, "error": f"{type(err).__name__}: {err}"}
+            async with lock:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+
+        pending: typing.Set[asyncio.Task] = set()
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(respond(line))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            await asyncio.gather(*pending)
+        finally:
+            writer.close()
+
+    async def handle_request(self, request: Any) -> Request:
+        """
+        Validate request, and run it in the solo pool if its estimated cost
+        is over SMALL_COST, otherwise in a batch. Raise ValueError if
+        request is malformed or its estimated cost is over MAX_COST.
+        """
+
+        start = time.perf_counter()
+        if not isinstance(request, dict):
+            raise ValueError("Request must be a JSON object")
+        op: Any = request.get("op", "")
+        args: Any = request.get("args", {})
+        if op == "metrics":
+            return {"id": request.get("id"), "result": self.metrics()}
+        if not isinstance(op, str) or op not in OPS:
+            raise ValueError(f"Unknown op {op}")
+        if not isinstance(args, dict):
+            raise ValueError("Request args must be a JSON object")
+
+        cost = request_cost(op, args)
+        if cost > MAX_COST:
+            raise ValueError(f"Request too large for {op}")
+        if cost > SMALL_COST:
+            self.solo += 1
+            kind, value = await self.run_solo(op, args)
+        else:
+            result = asyncio.get_running_loop().create_future()
+            await self.queue.put((op, args, result))
+            kind, value = await result
+
+        self.requests += 1
+        self.errors += kind == "error"
+        self.latencies.append(time.perf_counter() - start)
+        self.completions.append(time.perf_counter())
+        return {"id": request.get("id"), kind: value}
+
+    async def run_solo(self, op: str, args: dict) -> typing.Tuple[str, Any]:
+        """
+        Run request in the solo pool. If it runs longer than timeout, the
+        solo pool is replaced and its workers are terminated, as a running
+        pool task cannot be cancelled. Other solo requests running at the
+        time then fail with an error.
+        """
+
+        pool = self.solo_pool
+        task = asyncio.get_running_loop().run_in_executor(pool, run_batch, [(op, args)])
+        try:
+            return (await asyncio.wait_for(task, self.timeout))[0]
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.recycle_solo_pool(pool)
+            return "error", f"TimeoutError: {op} ran longer than {self.timeout}s"
+        except Exception as err:
+            return "error", f"{type(err).__name__}: {err}"
+
+    def recycle_solo_pool(self, pool: futures.ProcessPoolExecutor) -> None:
+        """
+        Replace the solo pool, and terminate the workers of the old one.
+        """
+
+        if pool is not self.solo_pool:
+            return
+        self.solo_pool = futures.ProcessPoolExecutor(max_workers=self.workers, initializer=warm_worker)
+        for process in list(getattr(pool, "_processes", {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def dispatch(self) -> None:
+        """
+        Collect queued requests into batches of up to BATCH_SIZE, waiting
+        at most BATCH_DELAY after the first, and run each batch in the pool.
+        """
+
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + BATCH_DELAY
+            while len(batch) < BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self.batches += 1
+            self.batched += len(batch)
+            task = loop.run_in_executor(self.pool, run_batch, [(op, args) for op, args, _ in batch])
+            task.add_done_callback(lambda done, batch=batch: self.complete(batch, done))
+
+    @staticmethod
+    def complete(batch: list, done: asyncio.Future) -> None:
+        if done.exception() is not None:
+            results = [("error", str(done.exception()))] * len(batch)
+        else:
+            results = done.result()
+        for (_, _, result), outcome in zip(batch, results):
+            if not result.done():
+                result.set_result(outcome)
+
+    def metrics(self) -> dict:
+        """
+        Return request counts, and the throughput and latency percentiles of
+        recent requests. Throughput is measured from the oldest request
+        completed within the last THROUGHPUT_WINDOW seconds to now, so idle
+        time before that is not counted.
+        """
+
+        now = time.perf_counter()
+        recent = [done for done in self.completions if now - done <= THROUGHPUT_WINDOW]
+        elapsed = now - recent[0] if recent else 0.0
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction: float) -> float:
+            return latencies[min(int(fraction * len(latencies)), len(latencies) - 1)] * 1000.0 if latencies else 0.0
+
+        return dict(requests=self.requests,
+                    errors=self.errors,
+                    batches=self.batches,
+                    mean_batch=self.batched / self.batches if self.batches else 0.0,
+                    solo=self.solo,
+                    timeouts=self.timeouts,
+                    throughput=len(recent) / elapsed if elapsed > 0 else 0.0,
+                    uptime=now - self.started,
+                    p50_ms=percentile(0.50),
+                    p95_ms=percentile(0.95),
+                    p99_ms=percentile(0.99))
+
+# --------------------------------------------------------------------------------
+# Client
+
+class SolverClient:
+    """
+    This class sends requests to a solver server over one connection,
+    matching responses to requests by id, so many calls can be in flight.
+    """
+
+    def __init__(self) -> None:
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.pending: typing.Dict[int, asyncio.Future] = {}
+        self.next_id: int = 0
+        self.receiver: Optional[asyncio.Task] = None
+
+    async def connect(self, address: str) -> None:
+        if address.isdigit():
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", int(address))
+        else:
+            self.reader, self.writer = await asyncio.open_unix_connection(address)
+        self.receiver = asyncio.create_task(self.receive())
+
+    async def receive(self) -> None:
+        """
+        Resolve pending calls with their responses. When the server closes
+        the connection, fail the calls still pending.
+        """
+
+        try:
+            while line := await self.reader.readline():
+                response = json.loads(line)
+                result = self.pending.pop(response.get("id"), None)
+                if result is not None and not result.done():
+                    result.set_result(response)
+        finally:
+            for result in self.pending.values():
+                if not result.done():
+                    result.set_exception(ConnectionError("Solver server closed the connection"))
+            self.pending.clear()
+
+    async def call(self, op: str, **args) -> Any:
+        if self.receiver.done():
+            raise ConnectionError("Solver server closed the connection")
+        self.next_id += 1
+        result = asyncio.get_running_loop().create_future()
+        self.pending[self.next_id] = result
+        self.writer.write(json.dumps({"id": self.next_id, "op": op, "args": args}).encode() + b"\n")
+        await self.writer.drain()
+        response = await result
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+    async def close(self) -> None:
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.receiver.cancel()
+
+LOAD_REQUESTS: Final = {
+    "has_cycle": dict(vertices=[1, 2, 3, 4, 5], edges=[[1, 2], [1, 3], [2, 3], [3, 4], [3, 5], [4, 1], [4, 5]]),
+    "count_islands": dict(world=[[1, 0, 0, 0, 0], [1, 1, 0, 1, 1], [1, 0, 0, 1, 0], [0, 0, 0, 1, 0], [1, 1, 0, 0, 0]]),
+    "generate_primes": dict(max_int=1000),
+    "count_queens": dict(size=6),
+    "max_contiguous_sum": dict(nums=[6, -5, -8, 9, 7, 10, 4, -3, 8, -5]),
+    "count_steps": dict(nsteps=1000, modulus=1000000007),
+    "estimate_pi": dict(samples=10000),
+    "next_generation_rule": dict(grid=[[0, 1, 0], [0, 1, 0], [0, 1, 0]], rule="B36/S23"),
+}
+
+async def run_load(address: str, concurrency: int = 32, requests: int = 5000, op: str = "has_cycle") -> None:
+    """
+    Load generator: send requests with concurrency calls in flight, and
+    report client side throughput and latency, and server metrics.
+    """
+
+    client = SolverClient()
+    await client.connect(address)
+    latencies: typing.List[float] = []
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            await client.call(op, **LOAD_REQUESTS[op])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"Op={op} Requests={len(latencies)} Concurrency={concurrency}")
+    print(f"Throughput={len(latencies) / elapsed:.0f} req/s "
+          f"p50={statistics.median(latencies) * 1000.0:.2f}ms "
+          f"p99={latencies[int(0.99 * (len(latencies) - 1))] * 1000.0:.2f}ms")
+    print(f"Server={await client.call('metrics')}")
+    await client.close()
+
+# --------------------------------------------------------------------------------
+# Main
+
+def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == "serve":
+        address = sys.argv[2] if len(sys.argv) >= 3 else str(PORT)
+        try:
+            asyncio.run(SolverServer().serve(address))
+        except asyncio.CancelledError:
+            print("Stopped")
+    elif len(sys.argv) >= 2 and sys.argv[1] == "load":
+        address = sys.argv[2] if len(sys.argv) >= 3 else str(PORT)
+        concurrency = int(sys.argv[3]) if len(sys.argv) >= 4 else 32
+        requests = int(sys.argv[4]) if len(sys.argv) >= 5 else 5000
+        op = sys.argv[5] if len(sys.argv) >= 6 else "has_cycle"
+        asyncio.run(run_load(address, concurrency, requests, op))
+    else:
+        print(__doc__)
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
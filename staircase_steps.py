@@ -13,7 +13,74 @@ climb the staircase, as shown below:
 
 """
 
-from puzzle_types import IntMap
+import typing
+from puzzle_types import IntArray, IntMatrix, IntMap, Optional, Final
+
+# (count(n), count(n - 1), count(n - 2))
+StepsState = typing.Tuple[int, int, int]
+
+def next_state(state: StepsState) -> StepsState:
+    return state[0] + state[1] + state[2], state[0], state[1]
+
+class StepsCache:
+    """
+    This class is a sequence cache of staircase counts for 1, 2 or 3 steps
+    at a time, which grows on demand and is shared by all queries. Only every
+    interval-th state is kept as a checkpoint, and counts in between are
+    recomputed from the nearest checkpoint below, in less than interval steps.
+    When there are more than max_checkpoints checkpoints, every other one is
+    dropped and the interval doubles, capping memory.
+    """
+
+    def __init__(self, interval: int = 64, max_checkpoints: int = 4096) -> None:
+        self.interval: int = interval
+        self.max_checkpoints: int = max_checkpoints
+        self.checkpoints: typing.List[StepsState] = [(1, 0, 0)]
+
+    def count(self, nsteps: int) -> int:
+        """
+        Get unique number of ways to climb a staircase of size nsteps.
+        """
+
+        return self.count_many([nsteps])[0]
+
+    def count_many(self, queries: typing.Iterable[int]) -> IntArray:
+        """
+        Get unique number of ways for each staircase size in queries, in one
+        pass over the sorted distinct sizes. The pass starts at the nearest
+        checkpoint below each size, and adds checkpoints past the last one.
+        """
+
+        queries = list(queries)
+        counts: IntMap = {}
+        pos: int = -1
+        state: StepsState = self.checkpoints[0]
+
+        for nsteps in sorted(set(queries)):
+            if nsteps < 0:
+                counts[nsteps] = 0
+                continue
+
+            idx: int = min(nsteps // self.interval, len(self.checkpoints) - 1)
+            if idx * self.interval > pos:
+                pos, state = idx * self.interval, self.checkpoints[idx]
+
+            while pos < nsteps:
+                state = next_state(state)
+                pos += 1
+                if pos == len(self.checkpoints) * self.interval:
+                    self.add_checkpoint(state)
+            counts[nsteps] = state[0]
+
+        return [counts[nsteps] for nsteps in queries]
+
+    def add_checkpoint(self, state: StepsState) -> None:
+        self.checkpoints.append(state)
+        if len(self.checkpoints) > self.max_checkpoints:
+            self.checkpoints = self.checkpoints[::2]
+            self.interval *= 2
+
+STEPS_CACHE: Final = StepsCache()
 
 def count_steps(nsteps: int) -> int:
     """
@@ -21,15 +88,68 @@ def count_steps(nsteps: int) -> int:
     size nsteps if one can climb 1, 2 or 3 steps at a time.
     """
 
-    counts: IntMap = {1: 1, 2: 2, 3: 4}
-    max_key: int = 3
+    return STEPS_CACHE.count(nsteps)
+
+def count_steps_many(queries: typing.Iterable[int]) -> IntArray:
+    """
+    Calculate count_steps for each staircase size in queries.
+    """
+
+    return STEPS_CACHE.count_many(queries)
 
-    if nsteps > max_key:
-        for i in range(4, nsteps + 1):
-            counts[i] = counts[i - 1] + counts[i - 2] + counts[i - 3]
-            max_key = i
+def mat_multiply(a: IntMatrix, b: IntMatrix, modulus: Optional[int] = None) -> IntMatrix:
+    """
+    Multiply square matrices a and b, reducing entries by modulus if given.
+    """
+
+    b_cols: IntMatrix = list(zip(*b))
+    product: IntMatrix = [[sum(x * y for x, y in zip(row, col)) for col in b_cols] for row in a]
+    if modulus is not None:
+        product = [[cell % modulus for cell in row] for row in product]
+    return product
+
+def mat_power(matrix: IntMatrix, power: int, modulus: Optional[int] = None) -> IntMatrix:
+    """
+    Raise square matrix to given power by repeated squaring.
+    """
 
-    return counts[nsteps]
+    size: int = len(matrix)
+    result: IntMatrix = [[int(i == j) for j in range(size)] for i in range(size)]
+    while power > 0:
+        if power & 1:
+            result = mat_multiply(result, matrix, modulus)
+        matrix = mat_multiply(matrix, matrix, modulus)
+        power >>= 1
+    return result
+
+def count_steps_fast(nsteps: int,
+                     steps: typing.Iterable[int] = (1, 2, 3),
+                     modulus: Optional[int] = None) -> int:
+    """
+    Calculate unique number of ways to climb a staircase of size nsteps
+    if one can climb any of the given step sizes at a time, optionally
+    modulo modulus.
+
+    With k the largest step size, count(n) = sum of count(n - s) for each
+    step size s, which is a linear recurrence of order k. Raising its k x k
+    companion matrix to the power nsteps gives count(nsteps) in its top left
+    entry, so no intermediate counts are kept. Complexity: O(k^3 log n)
+    """
+
+    step_sizes: IntArray = sorted(set(steps))
+    assert step_sizes and step_sizes[0] > 0
+    if nsteps < 0:
+        return 0
+
+    order: int = step_sizes[-1]
+    companion: IntMatrix = [[0] * order for _ in range(order)]
+    for step in step_sizes:
+        companion[0][step - 1] = 1
+    for i in range(1, order):
+        companion[i][i - 1] = 1
+
+    count: int = mat_power(companion, nsteps, modulus)[0][0]
+    return count % modulus if modulus is not None else count
 
 def test_steps() -> None:
     """
@@ -38,7 +158,8 @@ def test_steps() -> None:
 
     def test(nsteps: int, actual: int) -> None:
         uniq_cnt: int = count_steps(nsteps)
-        print(f"N={nsteps} count={uniq_cnt} actual={actual}")
+        fast_cnt: int = count_steps_fast(nsteps)
+        print(f"N={nsteps} count={uniq_cnt} fast={fast_cnt} actual={actual}")
 
     test(1, 1)
     test(2, 2)
@@ -47,5 +168,9 @@ def test_steps() -> None:
     test(5, 13)
     test(6, 24)
 
+    print(f"N=1..6 many={count_steps_many([6, 1, 5, 2, 4, 3])} actual=[24, 1, 13, 2, 7, 4]")
+    print(f"N=10 steps=(1, 2) count={count_steps_fast(10, (1, 2))} actual=89")
+    print(f"N=10^18 mod 10^9+7 count={count_steps_fast(10**18, modulus=10**9 + 7)}")
+
 if __name__ == "__main__":
     test_steps()